@@ -0,0 +1,132 @@
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from html_extractor import LISTING_ITEM, ListingPageExtractor, ProductPageExtractor, extract
+
+REPEATS = 20
+CHUNK_SIZE = 16 * 1024
+
+# Unrelated markup around the data, like the navigation and scripts of a real page
+FILLER = """<div class="nav"><ul>{items}</ul></div>
+<script>var config = {{"a": 1, "b": [1, 2, 3]}};</script>
+""".format(items="".join(f'<li class="menu"><a href="/menu/{i}">Menu &amp; item {i}</a></li>' for i in range(200)))
+
+
+def synthetic_product_page(num_features=20):
+    features = "".join(
+        f'<li><span class="adPage__content__features__key"> Feature {i} </span>'
+        f'<span class="adPage__content__features__value"><b>Value</b> {i} &euro;</span></li>'
+        for i in range(num_features)
+    )
+    return f"""<html><body>{FILLER}
+<div class="adPage__content__price-feature">
+  <span class="adPage__content__price-feature__prices__price__value">12 500</span>
+  <span class="adPage__content__price-feature__prices__price__currency">€</span>
+</div>
+<ul class="adPage__content__features">{features}
+  <li><span class="adPage__content__features__key">No value</span></li>
+</ul>{FILLER}</body></html>"""
+
+
+def synthetic_listing_page(num_ads=80):
+    ads = "".join(
+        f'<li class="ads-list-photo-item"><div class="photo"><a href="/ro/{80000000 + i}">'
+        f'<img src="/img/{i}.jpg"></a></div><a href="/ro/{80000000 + i}">Ad {i}</a></li>'
+        for i in range(num_ads)
+    )
+    return f'<html><body>{FILLER}<ul class="ads-list-photo">{ads}</ul>{FILLER}</body></html>'
+
+
+def soup_product_details(body):
+    """Reference implementation: the BeautifulSoup lookups the extractor replaced."""
+    soup = BeautifulSoup(body, 'html.parser')
+    product_data = {}
+
+    for feature in soup.find_all('span', class_='adPage__content__features__key'):
+        key = feature.text.strip()
+        value_tag = feature.find_next('span', class_='adPage__content__features__value')
+        value = value_tag.text.strip() if value_tag else "-"
+        product_data[key] = value
+
+    price_value_tag = soup.find('span', class_='adPage__content__price-feature__prices__price__value')
+    currency_tag = soup.find('span', class_='adPage__content__price-feature__prices__price__currency')
+    price = price_value_tag.text.strip() if price_value_tag else None
+    currency = currency_tag.text.strip() if currency_tag else None
+
+    return product_data, price, currency
+
+
+def soup_listing_links(body):
+    """Reference implementation: the BeautifulSoup listing scan the extractor replaced."""
+    soup = BeautifulSoup(body, 'html.parser')
+    links = []
+    for product in soup.find_all('li', class_='ads-list-photo-item'):
+        link = product.find('a')
+        if link and 'href' in link.attrs:
+            links.append(link['href'])
+    return links
+
+
+def stream_product_details(body):
+    page = extract(ProductPageExtractor(), chunked(body))
+    return page.features, page.price, page.currency
+
+
+def stream_listing_links(body):
+    return extract(ListingPageExtractor(), chunked(body)).links
+
+
+def chunked(body):
+    """Feed the page in socket-sized pieces, like extract_body() does."""
+    return (body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+
+
+def measure(parse, body):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        parse(body)
+    elapsed = (time.perf_counter() - start) / REPEATS
+
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main(paths):
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                pages.append((path, file.read()))
+    else:
+        pages = [("synthetic product page", synthetic_product_page()),
+                 ("synthetic listing page", synthetic_listing_page())]
+
+    for name, body in pages:
+        if LISTING_ITEM in body:
+            reference, streaming = soup_listing_links, stream_listing_links
+        else:
+            reference, streaming = soup_product_details, stream_product_details
+
+        # Parity: the extractor must return exactly what BeautifulSoup found
+        expected, actual = reference(body), streaming(body)
+        assert expected == actual, f"{name}: extractor output differs\n{expected}\n{actual}"
+
+        soup_time, soup_peak = measure(reference, body)
+        stream_time, stream_peak = measure(streaming, body)
+
+        print(f"{name} ({len(body) / 1024:.0f} KiB): parity OK")
+        print(f"  BeautifulSoup:     {soup_time * 1000:7.2f} ms  peak {soup_peak / 1024:8.0f} KiB")
+        print(f"  Stream extractor:  {stream_time * 1000:7.2f} ms  peak {stream_peak / 1024:8.0f} KiB")
+        print(f"  Speedup {soup_time / stream_time:.1f}x, memory {soup_peak / stream_peak:.1f}x lower")
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_extractor.py [saved_page.html ...]
+    main(sys.argv[1:])
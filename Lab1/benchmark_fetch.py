@@ -0,0 +1,147 @@
+import gzip
+import shutil
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from concurrent_fetch import fetch_all
+from http_cache import HTTPCache
+from http_pool import ConnectionPool
+from main import fetch_product_details
+
+# Simulated network + server latency for each product page
+LATENCY = 0.05
+# Simulated TCP + TLS handshake cost for each new connection
+HANDSHAKE_LATENCY = 0.05
+NUM_PRODUCTS = 40
+CONCURRENCY = 8
+
+PRODUCT_PAGE = """<html><body>
+<span class="adPage__content__price-feature__prices__price__value">{price}</span>
+<span class="adPage__content__price-feature__prices__price__currency">MDL</span>
+<ul>
+  <li><span class="adPage__content__features__key">Marcă</span>
+      <span class="adPage__content__features__value">Yamaha</span></li>
+  <li><span class="adPage__content__features__key">Model</span>
+      <span class="adPage__content__features__value">Ad {ad_id}</span></li>
+</ul>
+</body></html>"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve a fake product page after a fixed delay, with keep-alive support."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        time.sleep(HANDSHAKE_LATENCY)
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        ad_id = int(self.path.rstrip('/').rsplit('/', 1)[-1])
+        body = PRODUCT_PAGE.format(price=10000 + ad_id, ad_id=ad_id).encode('utf-8')
+        etag = f'"ad-{ad_id}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+
+        # Mix gzip, Content-Length and chunked responses
+        if ad_id % 3 == 0 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+
+        if ad_id % 2:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(body), 100):
+                chunk = body[start:start + 100]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_stub_server():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    server = start_stub_server()
+    host, port = server.server_address
+    urls = [f"/ad/{i}" for i in range(NUM_PRODUCTS)]
+    fetch = partial(fetch_product_details, host=host, port=port, use_ssl=False)
+
+    def serial(fetch):
+        return [fetch(url) for url in urls]
+
+    def concurrent(fetch):
+        return fetch_all(urls, fetch, max_workers=CONCURRENCY)
+
+    cache_dir = tempfile.mkdtemp(prefix="benchmark_cache_")
+    workers = f"Concurrent ({CONCURRENCY} workers)"
+
+    # (name, engine, use the keep-alive pool, cache TTL or None for no cache)
+    variants = (
+        ("Serial", serial, False, None),
+        (workers, concurrent, False, None),
+        ("Serial, keep-alive pool", serial, True, None),
+        (f"{workers}, keep-alive pool", concurrent, True, None),
+        (f"{workers}, pool, cold cache", concurrent, True, 3600),
+        (f"{workers}, pool, cache revalidated", concurrent, True, 0),
+        (f"{workers}, pool, fresh cache", concurrent, True, 3600),
+    )
+
+    timings = {}
+    baseline = None
+    for name, run, pooled, ttl in variants:
+        with ConnectionPool(max_idle_per_host=CONCURRENCY) as pool:
+            cache = HTTPCache(cache_dir, ttl=ttl) if ttl is not None else None
+            variant_fetch = partial(fetch, pool=pool if pooled else None, cache=cache)
+
+            start = time.perf_counter()
+            results = run(variant_fetch)
+            timings[name] = time.perf_counter() - start
+
+            if cache is not None:
+                cache.save()
+                print(f"{name}:\n{cache.report()}")
+
+        if baseline is None:
+            baseline = results
+        assert results == baseline, f"{name} results differ from the serial path"
+
+    server.shutdown()
+    shutil.rmtree(cache_dir)
+
+    print(f"Products fetched: {NUM_PRODUCTS} (latency {LATENCY * 1000:.0f} ms, "
+          f"handshake {HANDSHAKE_LATENCY * 1000:.0f} ms)")
+    serial_time = timings["Serial"]
+    for name, elapsed in timings.items():
+        print(f"{name:<50} {elapsed:6.2f} s  ({serial_time / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import io
+import json
+import random
+import time
+import tracemalloc
+
+from custom_serialization import CustomSerializer
+from main import serialize_to_json, serialize_to_ndjson, serialize_to_xml
+
+# 1,000,000 records is left to the command line: under tracemalloc each format takes minutes at that size
+SIZES = [1000, 10000, 100000]
+REPEATS = 3
+# A format counts as regressed when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.3
+
+BRANDS = ["Yamaha", "Honda", "Suzuki", "Kawasaki", "BMW", "KTM", "Ducati", "Viper"]
+COLOURS = ["Negru", "Roșu", "Alb", "Albastru", "Verde"]
+
+
+def synthetic_products(count, seed=0):
+    """Product records shaped like the scraper's product_data."""
+    rng = random.Random(seed)
+    return [{
+        "Marcă": rng.choice(BRANDS),
+        "Model": f"Model {rng.randint(1, 500)}",
+        "Tip ofertă": "Vând",
+        "Stare": rng.choice(["Nou", "Cu rulaj"]),
+        "Anul fabricației": str(rng.randint(1990, 2024)),
+        "Capacitate cilindrică": f"{rng.randint(50, 1800)} cm³",
+        "Culoarea": rng.choice(COLOURS),
+        "Price": rng.randint(500, 400000),
+        "Currency": rng.choice(["MDL", "€"]),
+    } for _ in range(count)]
+
+
+def best_time(function, argument, repeats=REPEATS):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(function, argument):
+    """Peak bytes allocated by Python while function(argument) runs."""
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def write_to_string(serialize):
+    """Adapt a serialize_to_* function that writes to a file into one that returns the text."""
+    def encode(products):
+        buffer = io.StringIO()
+        serialize(products, buffer)
+        return buffer.getvalue()
+    return encode
+
+
+def utf8_size(text):
+    return len(text.encode("utf-8"))
+
+
+def formats():
+    """(name, encode, decode, size_of) for every format; decode is None for one-way formats."""
+    serializer = CustomSerializer()
+    return [
+        ("text", serializer.serialize, serializer.deserialize, utf8_size),
+        ("binary", serializer.serialize_binary, serializer.deserialize_binary, len),
+        ("records", serializer.serialize_records, serializer.deserialize, utf8_size),
+        ("rec-bin", serializer.serialize_records_binary, serializer.deserialize_binary, len),
+        ("json", write_to_string(serialize_to_json), json.loads, utf8_size),
+        ("ndjson", write_to_string(serialize_to_ndjson),
+         lambda text: [json.loads(line) for line in text.splitlines()], utf8_size),
+        ("xml", write_to_string(serialize_to_xml), None, utf8_size),
+    ]
+
+
+def run(sizes, repeats=REPEATS):
+    """Measure every format on every dataset size and return the results by size and format."""
+    results = {}
+    for count in sizes:
+        products = synthetic_products(count)
+        results[count] = {}
+
+        print(f"\n{count} product records, best of {repeats}")
+        print(f"{'format':<8} {'bytes/record':>12} {'encode rec/s':>14} {'decode rec/s':>14} "
+              f"{'encode peak':>12} {'decode peak':>12}")
+        for name, encode, decode, size_of in formats():
+            encode_time, encoded = best_time(encode, products, repeats)
+            result = {
+                "bytes_per_record": size_of(encoded) / count,
+                "encode_per_sec": count / encode_time,
+                "encode_peak": peak_memory(encode, products),
+                "decode_per_sec": None,
+                "decode_peak": None,
+            }
+            if decode is not None:
+                decode_time, decoded = best_time(decode, encoded, repeats)
+                assert decoded == products, f"{name} round trip failed"
+                result["decode_per_sec"] = count / decode_time
+                result["decode_peak"] = peak_memory(decode, encoded)
+            results[count][name] = result
+
+            decode_rate = f"{result['decode_per_sec']:14,.0f}" if decode else f"{'-':>14}"
+            decode_peak = f"{result['decode_peak'] / 2 ** 20:9.1f} MB" if decode else f"{'-':>12}"
+            print(f"{name:<8} {result['bytes_per_record']:12.1f} {result['encode_per_sec']:14,.0f} "
+                  f"{decode_rate} {result['encode_peak'] / 2 ** 20:9.1f} MB {decode_peak}")
+    return results
+
+
+def compare(results, baseline):
+    """Print every rate that fell below the baseline by more than the threshold; return how many."""
+    regressions = 0
+    for count, by_format in results.items():
+        for name, result in by_format.items():
+            previous = baseline.get(str(count), {}).get(name)
+            if previous is None:
+                continue
+            for key in ("encode_per_sec", "decode_per_sec"):
+                if result[key] and previous[key] and previous[key] / result[key] > REGRESSION_THRESHOLD:
+                    regressions += 1
+                    print(f"REGRESSION {name} {key} at {count} records: "
+                          f"{result[key]:,.0f} vs {previous[key]:,.0f} before")
+    if not regressions:
+        print("\nNo regressions against the baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the product serialization formats.")
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES,
+                        help="dataset sizes in records, e.g. 1000 1000000")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--save", metavar="FILE", help="write the results to FILE as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against results saved with --save")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeats)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            if compare(results, json.load(file)):
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_serialization.py [1000 10000 ... 1000000] [--save FILE] [--baseline FILE]
+    main()
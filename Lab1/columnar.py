@@ -0,0 +1,98 @@
+import json
+from array import array
+
+import numpy as np
+
+
+class ProductBatch:
+    """Column-oriented product prices for bulk filtering and aggregation.
+
+    Prices are appended to a double array and currencies to an array of
+    small integer codes into self.currencies. Analysis views both columns
+    as numpy arrays without copying, so converting, filtering and
+    aggregating a few hundred thousand ads are single vectorized passes
+    instead of per-product dict lookups. The product records themselves
+    are kept only when keep_records is set, to hand back the products that
+    pass a filter.
+    """
+
+    def __init__(self, keep_records=True):
+        self.prices = array('d')
+        self.codes = array('H')
+        self.currencies = []
+        self.code_of = {}
+        self.records = [] if keep_records else None
+
+    @classmethod
+    def from_products(cls, products, keep_records=True):
+        """Build a batch from product dicts, skipping those without a price."""
+        batch = cls(keep_records)
+        for product in products:
+            batch.append(product)
+        return batch
+
+    @classmethod
+    def from_ndjson(cls, file, keep_records=False):
+        """Build a batch from an NDJSON product dump, one product per line."""
+        return cls.from_products((json.loads(line) for line in file if line.strip()), keep_records)
+
+    def __len__(self):
+        return len(self.prices)
+
+    def append(self, product):
+        """Add one product, ignoring it if it has no price."""
+        if "Price" not in product:
+            return
+        currency = product.get("Currency")
+        code = self.code_of.get(currency)
+        if code is None:
+            code = self.code_of[currency] = len(self.currencies)
+            self.currencies.append(currency)
+        self.prices.append(product["Price"])
+        self.codes.append(code)
+        if self.records is not None:
+            self.records.append(product)
+
+    def eur_prices(self, rates):
+        """Convert the whole price column to EUR in one pass.
+
+        rates maps a currency to the EUR value of one unit of it; currencies
+        missing from the table are taken to already be in EUR.
+        """
+        code_rates = np.array([rates.get(currency, 1.0) for currency in self.currencies] or [1.0])
+        # frombuffer views the append buffers in place; the views must not outlive this call
+        prices = np.frombuffer(self.prices, dtype=np.float64)
+        codes = np.frombuffer(self.codes, dtype=np.uint16)
+        return prices * code_rates[codes]
+
+    def in_range(self, low, high, rates, eur=None):
+        """Indices of the products whose EUR price lies in [low, high]."""
+        eur = self.eur_prices(rates) if eur is None else eur
+        return np.flatnonzero((eur >= low) & (eur <= high))
+
+    def select(self, indices):
+        """The product records at the given indices."""
+        records = self.records
+        return [records[i] for i in indices.tolist()]
+
+    def stats(self, rates, indices=None, percentiles=(50, 90, 99)):
+        """Count, total, mean, min, max and percentiles of the EUR prices."""
+        eur = self.eur_prices(rates)
+        if indices is not None:
+            eur = eur[indices]
+
+        if not len(eur):
+            return {"count": 0, "total": 0.0, "mean": None, "min": None, "max": None,
+                    **{f"p{p}": None for p in percentiles}}
+
+        total = float(eur.sum())
+        result = {
+            "count": len(eur),
+            "total": total,
+            "mean": total / len(eur),
+            "min": float(eur.min()),
+            "max": float(eur.max()),
+        }
+        for p, value in zip(percentiles, np.percentile(eur, percentiles)):
+            result[f"p{p}"] = float(value)
+        return result
@@ -0,0 +1,86 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+DEFAULT_HOST = "999.md"
+
+
+class RateLimiter:
+    """Space out requests to the same host by a minimum interval."""
+
+    def __init__(self, requests_per_second=None):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        """Block until the next request slot for the host is free."""
+        if not self.interval:
+            return
+
+        # Reserve a slot under the lock, sleep outside of it
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def host_of(url):
+    """Return the host a product URL points to (relative URLs go to 999.md)."""
+    return urlsplit(url).netloc or DEFAULT_HOST
+
+
+def fetch_with_retry(fetch, url, retries=2, backoff=0.5, rate_limiter=None):
+    """Call fetch(url), retrying failures with exponential backoff."""
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait(host_of(url))
+
+        try:
+            result = fetch(url)
+        except (OSError, ValueError) as e:
+            print(f"Error fetching {url} (attempt {attempt + 1}) - {e}")
+            result = None
+
+        if result is not None:
+            return result
+
+        if attempt < retries:
+            # Exponential backoff with a little jitter so workers don't retry in lockstep
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.8, 1.2))
+
+    return None
+
+
+def fetch_stream(urls, fetch, max_workers=8, requests_per_second=None, retries=2, backoff=0.5,
+                 window=None):
+    """Fetch URLs from any iterable on a bounded thread pool, yielding results in input order.
+
+    At most `window` fetches (2 * max_workers by default) are in flight, and
+    the next URL is only pulled from the iterable when a slot frees up, so a
+    slow consumer holds back the producer instead of letting results pile up.
+    """
+    rate_limiter = RateLimiter(requests_per_second)
+    window = window or 2 * max_workers
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for url in urls:
+            pending.append(executor.submit(fetch_with_retry, fetch, url, retries, backoff, rate_limiter))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def fetch_all(urls, fetch, max_workers=8, requests_per_second=None, retries=2, backoff=0.5):
+    """Fetch every URL on a bounded thread pool, returning results in input order."""
+    return list(fetch_stream(urls, fetch, max_workers, requests_per_second, retries, backoff,
+                             window=len(urls) or None))
@@ -1,18 +1,116 @@
+import codecs
 import re
+import struct
+from operator import itemgetter
+
+# Start of any value: a scalar like int(, a list L:[, a dict D:{, a record block R:[
+# or the legacy single-pair dict D:k:
+_VALUE_START = re.compile(r"\s*(?:(int|float|bool|str)\(|(L:\[)|(D:\{)|(R:\[)|(D:k:))")
+_VALUE_STARTS = ("int(", "float(", "bool(", "str(", "L:[", "D:{", "R:[", "D:k:")
+_UNESCAPE = re.compile(r"\\(.)", re.DOTALL)
+
+# Type tags of the binary format
+_TRUE = ord("T")
+_FALSE = ord("F")
+_INT = ord("I")
+_FLOAT = ord("D")
+_STR = ord("S")
+_LIST = ord("L")
+_DICT = ord("M")
+_RECORDS = ord("R")
+_DOUBLE = struct.Struct("<d")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Lists, dicts and record blocks nested deeper than this are rejected as malformed,
+# well before the decoders' recursion could hit Python's recursion limit
+MAX_DEPTH = 100
+
+
+class _Truncated(ValueError):
+    """The data ends in the middle of a value, so more of it could still make it valid."""
 
 
 class CustomSerializer:
+    """Serializes ints, floats, bools, strings and nested lists/dicts to a text format.
+
+    Format:
+        scalar  int(1)  float(1.5)  bool(true)  str(text)
+        list    L:[value; value]
+        dict    D:{k:scalar:v:value; k:scalar:v:value}
+
+    Inside str(...), a backslash and a closing parenthesis are escaped as
+    \\\\ and \\), so strings may contain any character, including ; ] and }.
+    The older single-pair dict form D:k:scalar:v:value is still accepted.
+
+    serialize_binary() / deserialize_binary() use a compact binary format
+    instead: every value is a one-byte type tag followed by its payload.
+    Ints are zigzag varints, floats are 8-byte little-endian doubles,
+    strings are a varint byte length plus UTF-8, and lists and dicts are a
+    varint item count followed by the items (key, value for dicts).
+
+    Lists of records that all share the same keys, like scraped products,
+    can be written with serialize_records() / serialize_records_binary()
+    as a record block instead: the key names are written once, followed
+    by one row of values per record.
+
+        records R:[key; key]:[[value; value]; [value; value]]
+
+    In binary a record block is the tag R, the key count and keys, then
+    the row count and the values of every row. Both deserialize methods
+    turn a block back into a list of dicts that share their key objects.
+    Encoding and decoding go through a RecordSchema compiled for the
+    record shape; register_schema() compiles one up front, otherwise it
+    is inferred from the first record and kept for the next call. An
+    inferred schema is rebuilt when a later block's first record has
+    different value types, such as a float Price where an int was seen.
+    """
+
+    def __init__(self):
+        self.schemas = {}
+
+    def register_schema(self, fields):
+        """Compile and keep a RecordSchema for records with the given {key: type} fields."""
+        schema = RecordSchema(fields)
+        self.schemas[schema.keys] = schema
+        return schema
+
+    def schema_for(self, record):
+        """The schema for the record's keys: the registered one, or one inferred from the record."""
+        keys = tuple(record)
+        schema = self.schemas.get(keys)
+        if schema is None or (schema.inferred and not schema.fits(record)):
+            schema = self.schemas[keys] = RecordSchema.of(record, self)
+        return schema
+
+    def serialize_records(self, records):
+        """Serializes a list of dicts with identical keys as a text record block."""
+        if not records:
+            return "R:[]:[]"
+        schema = self.schema_for(records[0])
+        encode = schema.encode_text
+        return f"{schema.header}[{'; '.join([encode(record) for record in records])}]"
+
+    def serialize_records_binary(self, records):
+        """Serializes a list of dicts with identical keys as a binary record block."""
+        out = bytearray()
+        out.append(_RECORDS)
+        if not records:
+            out += b"\x00\x00"
+            return bytes(out)
+        schema = self.schema_for(records[0])
+        out += schema.binary_header
+        _write_varint(len(records), out)
+        encode = schema.encode_binary
+        for record in records:
+            encode(record, out)
+        return bytes(out)
 
     def serialize(self, data):
         """Serializes a Python object into a custom format."""
         if isinstance(data, dict):
             # Dictionary serialization
-            items = []
-            for k, v in data.items():
-                serialized_key = f"k:{self._serialize_value(k)}"
-                serialized_value = f"v:{self._serialize_value(v)}"
-                items.append(f"D:{serialized_key}:{serialized_value}")
-            return f"{'; '.join(items)}"
+            items = [f"k:{self._serialize_value(k)}:v:{self.serialize(v)}" for k, v in data.items()]
+            return f"D:{{{'; '.join(items)}}}"
         elif isinstance(data, list):
             # List serialization
             serialized_items = [self.serialize(item) for item in data]
@@ -23,90 +121,657 @@ class CustomSerializer:
 
     def deserialize(self, data_str):
         """Deserializes the custom format string back into a Python object."""
-        if data_str.startswith("L:["):
-            # Handle list/dictionary
-            return self._deserialize_list_or_dict(data_str)
+        return _Parser(data_str, self.schemas).parse()
+
+    def serialize_binary(self, data):
+        """Serializes a Python object into the compact binary format."""
+        out = bytearray()
+        _encode_binary(data, out)
+        return bytes(out)
+
+    def deserialize_binary(self, data):
+        """Deserializes bytes (or any buffer, e.g. a memoryview) in the binary format."""
+        decoder = _BinaryDecoder(data)
+        value = decoder.value()
+        if decoder.pos != len(decoder.view):
+            raise ValueError(f"Unexpected data after the value at position {decoder.pos}")
+        return value
+
+    def iter_deserialize(self, stream, chunk_size=STREAM_CHUNK_SIZE):
+        """Yields the items of a serialized top-level list, or the records of a record block, one at a time.
+
+        stream is any object with a read(size) method returning str or
+        bytes (UTF-8), such as an open file or socket.makefile(). Only the
+        item being decoded is buffered, so a large dump can be processed
+        with bounded memory, and stopping early leaves the rest unread.
+        Malformed input raises ValueError as soon as it is read.
+        """
+        parser = _Parser("", self.schemas)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+
+        def read_more(size):
+            # Keep the unparsed tail and append the next chunk to it
+            chunk = stream.read(size)
+            if not chunk:
+                return False
+            if not isinstance(chunk, str):
+                chunk = decoder.decode(chunk)
+            parser.text = parser.text[parser.pos:] + chunk
+            parser.pos = 0
+            return True
+
+        def next_char():
+            char = parser.skip_space()
+            while not char and read_more(chunk_size):
+                char = parser.skip_space()
+            return char
+
+        def parse_whole(parse):
+            # Parse, reading on while the input is cut off at the end of the buffer;
+            # a syntax error before the end is raised at once, with no more read.
+            # The read size doubles each time so huge items are not re-parsed too often.
+            start = parser.pos
+            size = chunk_size
+            while True:
+                try:
+                    return parse()
+                except _Truncated:
+                    parser.pos = start
+                    if not read_more(size):
+                        raise
+                    start = 0
+                    size *= 2
+
+        next_char()
+        while len(parser.text) - parser.pos < 3 and read_more(chunk_size):
+            pass
+        if parser.text.startswith("L:[", parser.pos):
+            parser.pos += 3
+            parse_item = parser.value
+        elif parser.text.startswith("R:[", parser.pos):
+            parser.pos += 3
+            parse_item = parser.row_parser(parse_whole(parser.record_keys))
         else:
-            # For basic data types
-            return self._deserialize_value(data_str)
+            parser.fail("Expected a list or a record block")
+
+        first = True
+        while True:
+            char = next_char()
+            if char == "]":
+                parser.pos += 1
+                return
+            if not first:
+                if char != ";":
+                    parser.fail("Expected ';' or ']'")
+                parser.pos += 1
+            first = False
+
+            yield parse_whole(parse_item)
+
+    def iter_deserialize_binary(self, stream, chunk_size=STREAM_CHUNK_SIZE):
+        """Yields the items of a top-level list, or the records of a record block, in the binary format.
+
+        stream is any object with a read(size) method returning bytes.
+        """
+        buffer = b""
+        pos = 0
+        size = chunk_size
+
+        def decode(read):
+            # Decode from the buffer, reading more while the data is cut off
+            nonlocal buffer, pos, size
+            while True:
+                decoder = _BinaryDecoder(buffer)
+                decoder.pos = pos
+                try:
+                    result = read(decoder)
+                    pos = decoder.pos
+                    size = chunk_size
+                    return result
+                except (_Truncated, IndexError):
+                    chunk = stream.read(size)
+                    if not chunk:
+                        raise _Truncated("Truncated binary data") from None
+                    buffer = buffer[pos:] + chunk
+                    pos = 0
+                    size *= 2
+
+        def read_header(decoder):
+            tag = decoder.view[decoder.pos]
+            decoder.pos += 1
+            if tag == _LIST:
+                return None, decoder.varint()
+            if tag == _RECORDS:
+                return decoder.record_keys(), decoder.varint()
+            raise ValueError("Expected a list or a record block")
+
+        keys, count = decode(read_header)
+        if keys is None:
+            read_item = _BinaryDecoder.value
+        else:
+            # Every record shares the key objects decoded once from the header
+            def read_item(decoder):
+                return decoder.row(keys)
+        for _ in range(count):
+            yield decode(read_item)
 
     def _serialize_value(self, value):
         """Helper function to serialize a basic value."""
-        if isinstance(value, int):
+        # bool first, since bool is a subclass of int
+        if isinstance(value, bool):
+            return f"bool({str(value).lower()})"
+        elif isinstance(value, int):
             return f"int({value})"
         elif isinstance(value, str):
+            if "\\" in value or ")" in value:
+                value = value.replace("\\", "\\\\").replace(")", "\\)")
             return f"str({value})"
         elif isinstance(value, float):
-            return f"float({value})"
-        elif isinstance(value, bool):
-            return f"bool({str(value).lower()})"
+            return f"float({value!r})"
         else:
             raise TypeError(f"Unsupported type: {type(value)}")
 
-    def _deserialize_value(self, value_str):
-        """Helper function to deserialize a basic value."""
-        if value_str.startswith("int("):
-            return int(value_str[4:-1])
-        elif value_str.startswith("str("):
-            return value_str[4:-1]
-        elif value_str.startswith("float("):
-            return float(value_str[6:-1])
-        elif value_str.startswith("bool("):
-            return value_str[5:-1] == "true"
+
+class RecordSchema:
+    """Encoders and a text row decoder compiled for one record shape.
+
+    fields maps every key to the type of its value: str, int, float, bool,
+    or object for a value of any type. A record whose values all have the
+    declared types takes the compiled path: its values come out of one
+    itemgetter call and are formatted into a prebuilt row template, and a
+    text row is read back with a single regular expression match. Other
+    records are encoded value by value, so they still round-trip, only
+    more slowly.
+    """
+
+    def __init__(self, fields, serializer=None):
+        self.keys = tuple(fields)
+        self.types = tuple(fields.values())
+        for field_type in self.types:
+            if field_type is not object and field_type not in _SCALAR_TAGS:
+                raise TypeError(f"Unsupported field type: {field_type}")
+        self.serializer = serializer or CustomSerializer()
+        self.compiled = object not in self.types
+        # Set for schemas guessed from an example record, which may be replaced by a better guess
+        self.inferred = False
+
+        getter = itemgetter(*self.keys) if self.keys else (lambda record: ())
+        # itemgetter of a single key returns the bare value, not a tuple
+        self.getter = (lambda record: (getter(record),)) if len(self.keys) == 1 else getter
+
+        serialize_key = self.serializer._serialize_value
+        self.header = f"R:[{'; '.join(serialize_key(key) for key in self.keys)}]:"
+        self.binary_header = bytearray()
+        _write_varint(len(self.keys), self.binary_header)
+        for key in self.keys:
+            _encode_binary(key, self.binary_header)
+
+        if self.compiled:
+            self.template = f"[{'; '.join(_SCALAR_TAGS[t] + '({})' for t in self.types)}]"
+            self.bool_fields = [t is bool for t in self.types] if bool in self.types else None
+            self.writers = [_BINARY_WRITERS[t] for t in self.types]
+            self.row_pattern = re.compile(
+                r"\s*\[\s*" + r"\s*;\s*".join(_SCALAR_PATTERNS[t] for t in self.types) + r"\s*\]",
+                re.DOTALL)
+            self.converters = [_SCALAR_CONVERTERS[t] for t in self.types]
+
+    @classmethod
+    def of(cls, record, serializer=None):
+        """Schema for the shape of an example record."""
+        schema = cls({key: _field_type(value) for key, value in record.items()}, serializer)
+        schema.inferred = True
+        return schema
+
+    def fits(self, record):
+        """Whether the record's values have the field types, in key order."""
+        return tuple(map(_field_type, record.values())) == self.types
+
+    def values(self, record):
+        """The record's values in key order; raises ValueError if its keys differ."""
+        try:
+            if len(record) == len(self.keys):
+                return self.getter(record)
+        except KeyError:
+            pass
+        raise ValueError(f"Record keys {list(record)} do not match the schema keys {list(self.keys)}")
+
+    def encode_text(self, record):
+        values = self.values(record)
+        if self.compiled and tuple(map(type, values)) == self.types:
+            formatted = values
+            if self.bool_fields:
+                formatted = [("true" if value else "false") if is_bool else value
+                             for value, is_bool in zip(values, self.bool_fields)]
+            row = self.template.format(*formatted)
+            # Exactly one ) per value and no backslash means no string needed escaping
+            if row.count(")") == len(values) and "\\" not in row:
+                return row
+        serialize = self.serializer.serialize
+        return f"[{'; '.join([serialize(value) for value in values])}]"
+
+    def encode_binary(self, record, out):
+        values = self.values(record)
+        if self.compiled and tuple(map(type, values)) == self.types:
+            for write, value in zip(self.writers, values):
+                write(value, out)
         else:
-            raise TypeError(f"Unsupported serialized type: {value_str}")
+            for value in values:
+                _encode_binary(value, out)
 
-    def _deserialize_list_or_dict(self, list_str):
-        """Helper function to deserialize a list or list of dictionaries."""
-        list_str = list_str[3:-1]  # Remove L:[ and final ]
-        items = self._split_items(list_str)
-        result = []
-        for item in items:
-            if item.startswith("D:"):
-                # It's a dictionary item
-                result.append(self._deserialize_dict(item))
-            else:
-                # It's a regular list item
-                result.append(self.deserialize(item))
-        return result
-
-    def _deserialize_dict(self, dict_str):
-        """Helper function to deserialize a dictionary."""
-        dict_str = dict_str[2:]  # Remove 'D:' prefix
-        key_match = re.search(r"k:(\w+?)\((.+?)\):v:(\w+?)\((.+?)\)", dict_str)
-        if key_match:
-            key_type, key_value, value_type, value_value = key_match.groups()
-            key = self._deserialize_value(f"{key_type}({key_value})")
-            value = self._deserialize_value(f"{value_type}({value_value})")
+    def decode_row(self, match):
+        """The record for a match of row_pattern."""
+        return dict(zip(self.keys, [convert(group) for convert, group in zip(self.converters, match.groups())]))
+
+
+def _field_type(value):
+    return type(value) if type(value) in _SCALAR_TAGS else object
+
+
+def _unescape(text):
+    return _UNESCAPE.sub(r"\1", text) if "\\" in text else text
+
+
+def _write_str(value, out):
+    encoded = value.encode("utf-8")
+    out.append(_STR)
+    _write_varint(len(encoded), out)
+    out += encoded
+
+
+def _write_int(value, out):
+    out.append(_INT)
+    _write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+
+
+def _write_float(value, out):
+    out.append(_FLOAT)
+    out += _DOUBLE.pack(value)
+
+
+def _write_bool(value, out):
+    out.append(_TRUE if value else _FALSE)
+
+
+_SCALAR_TAGS = {str: "str", int: "int", float: "float", bool: "bool"}
+_SCALAR_PATTERNS = {
+    str: r"str\(([^\\)]*(?:\\.[^\\)]*)*)\)",
+    int: r"int\((-?\d+)\)",
+    float: r"float\(([^)]*)\)",
+    bool: r"bool\((true|false)\)",
+}
+_SCALAR_CONVERTERS = {str: _unescape, int: int, float: float, bool: "true".__eq__}
+_BINARY_WRITERS = {str: _write_str, int: _write_int, float: _write_float, bool: _write_bool}
+
+
+class _Parser:
+    """Single-pass recursive-descent parser for the CustomSerializer text format."""
+
+    def __init__(self, text, schemas=None):
+        self.text = text
+        self.pos = 0
+        self.depth = 0
+        self.schemas = schemas or {}
+
+    def parse(self):
+        value = self.value()
+        if self.text[self.pos:].strip():
+            self.fail("Unexpected data after the value")
+        return value
+
+    def fail(self, message, truncated=False):
+        error = _Truncated if truncated else ValueError
+        raise error(f"{message} at position {self.pos}: {self.text[self.pos:self.pos + 20]!r}")
+
+    def expect(self, literal):
+        if not self.text.startswith(literal, self.pos):
+            # Only the end of the text cut short is truncation; anything else is a syntax error
+            self.fail(f"Expected '{literal}'", literal.startswith(self.text[self.pos:]))
+        self.pos += len(literal)
+
+    def value(self):
+        match = _VALUE_START.match(self.text, self.pos)
+        if match is None:
+            rest = self.text[self.pos:].lstrip()
+            self.fail("Expected a value", any(start.startswith(rest) for start in _VALUE_STARTS))
+        self.pos = match.end()
+        scalar_type, list_start, dict_start, records_start, legacy_pair = match.groups()
+
+        if scalar_type:
+            return self.scalar(scalar_type)
+
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            self.fail(f"Nested deeper than {MAX_DEPTH} levels")
+        try:
+            if list_start:
+                return self.items("]", self.value)
+            if dict_start:
+                return dict(self.items("}", self.pair))
+            if records_start:
+                return self.records()
+            # Legacy D:k:...:v:... item, a dict with a single pair
+            key, value = self.pair_body()
             return {key: value}
+        finally:
+            self.depth -= 1
+
+    def scalar(self, scalar_type):
+        text = self.text
+        if scalar_type == "str":
+            # Find the first ) not preceded by an odd number of backslashes
+            end = text.find(")", self.pos)
+            while end != -1:
+                backslashes = 0
+                while end - 1 - backslashes >= self.pos and text[end - 1 - backslashes] == "\\":
+                    backslashes += 1
+                if backslashes % 2 == 0:
+                    break
+                end = text.find(")", end + 1)
         else:
-            raise ValueError("Failed to parse dictionary from serialized format")
-
-    def _split_items(self, s):
-        """Helper function to split serialized list items, handling nested structures."""
-        items = []
-        stack = []
-        current = []
-        for char in s:
-            if char == '[':
-                stack.append(char)
-            elif char == ']':
-                stack.pop()
-            if char == ';' and not stack:
-                items.append(''.join(current).strip())
-                current = []
-            else:
-                current.append(char)
-        if current:
-            items.append(''.join(current).strip())
-        return items
-
-
-serializer = CustomSerializer()
-
-data = [{"key1": "val1"}, {"key2": 2}]
-serialized_data = serializer.serialize(data)
-print("Serialized:", serialized_data)
-
-deserialized_data = serializer.deserialize(serialized_data)
-print("Deserialized:", deserialized_data)
+            end = text.find(")", self.pos)
+        if end == -1:
+            self.fail(f"Unterminated {scalar_type}(", True)
+
+        raw = text[self.pos:end]
+        self.pos = end + 1
+
+        if scalar_type == "str":
+            return _UNESCAPE.sub(r"\1", raw) if "\\" in raw else raw
+        if scalar_type == "int":
+            return int(raw)
+        if scalar_type == "float":
+            return float(raw)
+        if raw not in ("true", "false"):
+            self.fail(f"Invalid bool {raw!r}")
+        return raw == "true"
+
+    def items(self, close, parse_item):
+        """Parse `item; item; ...` up to the closing bracket."""
+        result = []
+        if self.skip_space() == close:
+            self.pos += 1
+            return result
+
+        while True:
+            result.append(parse_item())
+            char = self.skip_space()
+            self.pos += 1
+            if char == close:
+                return result
+            if char != ";":
+                self.pos -= 1
+                self.fail(f"Expected ';' or '{close}'", not char)
+
+    def records(self):
+        """Parse the rest of a record block, R:[ already consumed."""
+        keys = self.record_keys()
+        return self.items("]", self.row_parser(keys))
+
+    def record_keys(self):
+        """Parse a record block's keys and the :[ after them, R:[ already consumed."""
+        keys = tuple(self.items("]", self.value))
+        if any(isinstance(key, (list, dict)) for key in keys):
+            self.fail("Record keys must be scalars")
+        self.expect(":[")
+        return keys
+
+    def row_parser(self, keys):
+        """A function that parses the next row of a record block with these keys."""
+        # Rows matching a compiled schema skip the generic parser. Without a
+        # registered schema, one is inferred from the first row's value types.
+        schema = self.schemas.get(keys)
+        first = True
+
+        def parse_row():
+            nonlocal schema, first
+            record = self.row(keys, schema)
+            if first:
+                first = False
+                if schema is None or (schema.inferred and not schema.fits(record)):
+                    schema = RecordSchema.of(record)
+            return record
+
+        return parse_row
+
+    def row(self, keys, schema):
+        if schema is not None and schema.compiled:
+            match = schema.row_pattern.match(self.text, self.pos)
+            if match:
+                self.pos = match.end()
+                return schema.decode_row(match)
+
+        self.skip_space()
+        self.expect("[")
+        values = self.items("]", self.value)
+        if len(values) != len(keys):
+            self.fail(f"Expected {len(keys)} values in the row")
+        return dict(zip(keys, values))
+
+    def pair(self):
+        self.skip_space()
+        self.expect("k:")
+        return self.pair_body()
+
+    def pair_body(self):
+        key = self.value()
+        if isinstance(key, (list, dict)):
+            self.fail("Dict keys must be scalars")
+        self.expect(":v:")
+        return key, self.value()
+
+    def skip_space(self):
+        """Skip whitespace and return the next character ('' at the end)."""
+        text = self.text
+        while self.pos < len(text) and text[self.pos].isspace():
+            self.pos += 1
+        return text[self.pos:self.pos + 1]
+
+
+def _write_varint(number, out):
+    while number > 0x7F:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _encode_binary(value, out):
+    # bool first, since bool is a subclass of int
+    if value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        # Zigzag encoding keeps small negative numbers short
+        _write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        out.append(_STR)
+        _write_varint(len(encoded), out)
+        out += encoded
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, list):
+        out.append(_LIST)
+        _write_varint(len(value), out)
+        for item in value:
+            _encode_binary(item, out)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_varint(len(value), out)
+        for key, item in value.items():
+            if isinstance(key, (list, dict)):
+                raise TypeError(f"Unsupported key type: {type(key)}")
+            _encode_binary(key, out)
+            _encode_binary(item, out)
+    else:
+        raise TypeError(f"Unsupported type: {type(value)}")
+
+
+class _BinaryDecoder:
+    """Decodes the binary format straight out of a memoryview, without slicing copies."""
+
+    def __init__(self, data):
+        self.view = memoryview(data).cast("B")
+        self.pos = 0
+        self.depth = 0
+
+    def varint(self):
+        view = self.view
+        byte = view[self.pos]
+        self.pos += 1
+        if byte < 0x80:
+            return byte
+        number = byte & 0x7F
+        shift = 7
+        while True:
+            byte = view[self.pos]
+            self.pos += 1
+            number |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    def value(self):
+        view = self.view
+        try:
+            tag = view[self.pos]
+            self.pos += 1
+        except IndexError:
+            raise _Truncated("Truncated binary data") from None
+
+        try:
+            if tag == _STR:
+                # Inline the common one-byte length
+                size = view[self.pos]
+                if size < 0x80:
+                    self.pos += 1
+                else:
+                    size = self.varint()
+                start = self.pos
+                self.pos = end = start + size
+                if end > len(view):
+                    raise IndexError
+                return str(view[start:end], "utf-8")
+            if tag == _INT:
+                number = self.varint()
+                return number >> 1 if not number & 1 else -(number >> 1) - 1
+            # Containers count their depth; it is left raised when decoding fails,
+            # since a failed decoder is not reused
+            if tag == _DICT:
+                self.nest()
+                result = {}
+                value = self.value
+                try:
+                    for _ in range(self.varint()):
+                        key = value()
+                        result[key] = value()
+                except TypeError:
+                    # A list or dict read as a key is unhashable
+                    raise ValueError(f"Dict keys must be scalars at position {self.pos}") from None
+                self.depth -= 1
+                return result
+            if tag == _LIST:
+                self.nest()
+                value = self.value
+                result = [value() for _ in range(self.varint())]
+                self.depth -= 1
+                return result
+            if tag == _RECORDS:
+                self.nest()
+                keys = self.record_keys()
+                value = self.value
+                size = len(keys)
+                result = [dict(zip(keys, [value() for _ in range(size)])) for _ in range(self.varint())]
+                self.depth -= 1
+                return result
+            if tag == _TRUE:
+                return True
+            if tag == _FALSE:
+                return False
+            if tag == _FLOAT:
+                number, = _DOUBLE.unpack_from(view, self.pos)
+                self.pos += 8
+                return number
+        except (IndexError, struct.error):
+            raise _Truncated("Truncated binary data") from None
+
+        raise ValueError(f"Unknown type tag {tag!r} at position {self.pos - 1}")
+
+    def nest(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise ValueError(f"Nested deeper than {MAX_DEPTH} levels at position {self.pos - 1}")
+
+    def record_keys(self):
+        """Decode a record block's keys, its R tag already consumed."""
+        value = self.value
+        keys = [value() for _ in range(self.varint())]
+        if any(isinstance(key, (list, dict)) for key in keys):
+            raise ValueError(f"Record keys must be scalars at position {self.pos}")
+        return keys
+
+    def row(self, keys):
+        value = self.value
+        return dict(zip(keys, [value() for _ in keys]))
+
+
+if __name__ == "__main__":
+    import random
+
+    serializer = CustomSerializer()
+
+    data = [{"key1": "val1"}, {"key2": 2}]
+    serialized_data = serializer.serialize(data)
+    print("Serialized:", serialized_data)
+
+    deserialized_data = serializer.deserialize(serialized_data)
+    print("Deserialized:", deserialized_data)
+
+    # Round-trip property: deserialize(serialize(x)) == x for random nested data
+    def random_value(rng, depth=0):
+        kind = rng.choice(["int", "float", "bool", "str"] + (["list", "dict"] if depth < 4 else []))
+        if kind == "int":
+            return rng.randint(-10 ** 12, 10 ** 12)
+        if kind == "float":
+            return rng.uniform(-1e6, 1e6)
+        if kind == "bool":
+            return rng.random() < 0.5
+        if kind == "str":
+            return "".join(rng.choice("ab ;:)([]{}\\kvDL\n") for _ in range(rng.randint(0, 12)))
+        if kind == "list":
+            return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+        return {random_value(rng, 4): random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+    rng = random.Random(0)
+    for _ in range(2000):
+        value = random_value(rng)
+        assert serializer.deserialize(serializer.serialize(value)) == value, value
+        assert serializer.deserialize_binary(serializer.serialize_binary(value)) == value, value
+    print("Round-trip check passed for 2000 random values (text and binary)")
+
+    # Record blocks: same-shaped dicts, including values that miss the compiled path
+    records = [{"id": i, "name": random_value(rng, 4), "ok": i % 2 == 0} for i in range(500)]
+    serializer.register_schema({"id": int, "name": str, "ok": bool})
+    assert serializer.deserialize(serializer.serialize_records(records)) == records
+    assert serializer.deserialize_binary(serializer.serialize_records_binary(records)) == records
+    print("Round-trip check passed for a 500-record block (text and binary)")
+
+    # Inferred schemas: nested values in the first record, then a block with other value types
+    for block in ([{"a": [1, {"b": 2}], "price": 10}], [{"a": "x", "price": 10.5}] * 3):
+        assert serializer.deserialize(serializer.serialize_records(block)) == block
+        assert serializer.deserialize_binary(serializer.serialize_records_binary(block)) == block
+    assert serializer.schemas[("a", "price")].types == (str, float)
+    print("Round-trip check passed for blocks with inferred schemas")
+
+    # Streaming: a syntax error is raised where it is read, not once the rest is buffered
+    import io
+    stream = io.StringIO("L:[int(1);bad(2);" + serializer.serialize(list(range(100000)))[3:])
+    try:
+        for _ in serializer.iter_deserialize(stream, 64):
+            pass
+        raise AssertionError("malformed stream was accepted")
+    except ValueError:
+        assert stream.tell() <= 64, stream.tell()
+    print("Streaming check passed: malformed input fails after one chunk")
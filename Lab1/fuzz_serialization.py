@@ -0,0 +1,199 @@
+import io
+import json
+import random
+import sys
+import xml.etree.ElementTree as ElementTree
+
+from custom_serialization import MAX_DEPTH, CustomSerializer
+from writers import JSONWriter, NDJSONWriter, XMLWriter
+
+ITERATIONS = 1000
+# Characters that are syntax in the text format, plus whitespace, escapes and non-ASCII text
+ALPHABET = "ab ;:,()[]{}\\kvDLRstrint\n\t\"'<>&éș€\u0000"
+
+
+def random_scalar(rng):
+    kind = rng.choice(["int", "bigint", "float", "bool", "str", "str"])
+    if kind == "int":
+        return rng.randint(-300, 300)
+    if kind == "bigint":
+        return rng.randint(-10 ** 30, 10 ** 30)
+    if kind == "float":
+        return rng.choice([0.0, -0.0, 1e-300, 1e300, float("inf"), float("-inf"), rng.uniform(-1e6, 1e6)])
+    if kind == "bool":
+        return rng.random() < 0.5
+    return random_text(rng)
+
+
+def random_text(rng, max_length=12):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+
+def random_value(rng, depth=0):
+    """Nested lists and multi-key dicts of scalars, up to four levels deep."""
+    kind = rng.random()
+    if depth >= 4 or kind < 0.5:
+        return random_scalar(rng)
+    if kind < 0.75:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))]
+    return {random_scalar(rng): random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))}
+
+
+def random_records(rng):
+    """Records sharing random keys, mostly with one type per field but with some stragglers."""
+    fields = {random_text(rng, 6): rng.choice([str, int, float, bool]) for _ in range(rng.randint(1, 6))}
+    records = []
+    for _ in range(rng.randint(0, 20)):
+        record = {}
+        for key, field_type in fields.items():
+            value = random_scalar(rng)
+            while rng.random() < 0.9 and type(value) is not field_type:
+                value = random_scalar(rng)
+            record[key] = value
+        records.append(record)
+    return records
+
+
+def mutate(data, rng):
+    """Truncate, delete, duplicate or overwrite a random slice of the encoded data."""
+    if not data:
+        return data
+    start = rng.randrange(len(data))
+    end = min(len(data), start + rng.randint(1, 4))
+    kind = rng.choice(["truncate", "delete", "duplicate", "overwrite"])
+    if kind == "truncate":
+        return data[:start]
+    if kind == "delete":
+        return data[:start] + data[end:]
+    if kind == "duplicate":
+        return data[:end] + data[start:]
+    if isinstance(data, str):
+        filler = "".join(rng.choice(ALPHABET) for _ in range(end - start))
+    else:
+        filler = bytes(rng.randrange(256) for _ in range(end - start))
+    return data[:start] + filler + data[end:]
+
+
+class Trickle:
+    """A file-like object that returns at most `size` characters or bytes per read."""
+
+    def __init__(self, data, size):
+        self.data = data
+        self.pos = 0
+        self.size = size
+
+    def read(self, size=-1):
+        chunk = self.data[self.pos:self.pos + min(size, self.size)]
+        self.pos += len(chunk)
+        return chunk
+
+
+def same(a, b):
+    """Equality that also tells 0.0 from -0.0, which == does not."""
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b and str(a) == str(b)
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same(a[key], b[key]) for key in a)
+    return a == b
+
+
+def check_round_trips(serializer, rng):
+    value = random_value(rng)
+    text = serializer.serialize(value)
+    assert same(serializer.deserialize(text), value), ("text", value, text)
+    binary = serializer.serialize_binary(value)
+    assert same(serializer.deserialize_binary(binary), value), ("binary", value, binary)
+
+    items = [random_value(rng) for _ in range(rng.randint(0, 5))]
+    size = rng.randint(1, 8)
+    streamed = list(serializer.iter_deserialize(Trickle(serializer.serialize(items), size), size))
+    assert same(streamed, items), ("iter_deserialize", items)
+    encoded = serializer.serialize(items).encode("utf-8")
+    streamed = list(serializer.iter_deserialize(Trickle(encoded, size), size))
+    assert same(streamed, items), ("iter_deserialize bytes", items)
+    streamed = list(serializer.iter_deserialize_binary(Trickle(serializer.serialize_binary(items), size), size))
+    assert same(streamed, items), ("iter_deserialize_binary", items)
+
+    records = random_records(rng)
+    text = serializer.serialize_records(records)
+    assert same(serializer.deserialize(text), records), ("records", records, text)
+    binary = serializer.serialize_records_binary(records)
+    assert same(serializer.deserialize_binary(binary), records), ("records binary", records, binary)
+    streamed = list(serializer.iter_deserialize(Trickle(text, size), size))
+    assert same(streamed, records), ("iter_deserialize records", records, text)
+    streamed = list(serializer.iter_deserialize_binary(Trickle(binary, size), size))
+    assert same(streamed, records), ("iter_deserialize_binary records", records, binary)
+
+
+def check_corrupted_input(serializer, rng):
+    """Damaged input must fail with ValueError, never with another exception or a hang."""
+    value = random_value(rng)
+    # Nesting past MAX_DEPTH, unterminated, must not reach Python's recursion limit
+    depth = rng.randint(MAX_DEPTH + 1, 50 * MAX_DEPTH)
+    for damaged, decode in ((mutate(serializer.serialize(value), rng), serializer.deserialize),
+                            (mutate(serializer.serialize_binary(value), rng), serializer.deserialize_binary),
+                            (mutate(serializer.serialize_records(random_records(rng)), rng), serializer.deserialize),
+                            ("L:[" * depth, serializer.deserialize),
+                            ("D:{k:int(1):v:" * depth, serializer.deserialize),
+                            (b"L\x01" * depth, serializer.deserialize_binary),
+                            (b"M\x01I\x02" * depth, serializer.deserialize_binary)):
+        try:
+            decode(damaged)
+        except ValueError:
+            pass
+        except Exception as error:
+            raise AssertionError(("corrupted", damaged, repr(error))) from error
+
+
+def check_writers(rng):
+    records = [{random_text(rng, 8) or "key": random_scalar(rng) for _ in range(rng.randint(1, 5))}
+               for _ in range(rng.randint(0, 5))]
+    # JSON has no infinities
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, float) and value in (float("inf"), float("-inf")):
+                record[key] = 0.5
+
+    for writer_class, load in ((JSONWriter, json.loads),
+                               (NDJSONWriter, lambda text: [json.loads(line) for line in text.splitlines()])):
+        buffer = io.StringIO()
+        with writer_class(buffer) as writer:
+            for record in records:
+                writer.write(record)
+        assert same(load(buffer.getvalue()), records), (writer_class.__name__, records)
+
+    buffer = io.StringIO()
+    with XMLWriter(buffer) as writer:
+        for record in records:
+            writer.write(record)
+    root = ElementTree.fromstring(buffer.getvalue())
+    parsed = [{element.get("name", element.tag): element.text or "" for element in product} for product in root]
+    # XML keeps every value as text, minus the characters it cannot represent at all
+    expected = [{key.replace("\u0000", ""): str(value).replace("\u0000", "") for key, value in record.items()}
+                for record in records]
+    assert parsed == expected, ("xml", records, buffer.getvalue())
+
+
+def main(iterations=ITERATIONS, seed=0):
+    rng = random.Random(seed)
+    serializer = CustomSerializer()
+    checks = [check_round_trips, check_corrupted_input, lambda serializer, rng: check_writers(rng)]
+    for iteration in range(iterations):
+        for check in checks:
+            # Seed every case on its own so a failure can be replayed in isolation
+            case_seed = rng.randrange(2 ** 32)
+            try:
+                check(serializer, random.Random(case_seed))
+            except AssertionError:
+                print(f"Failed at iteration {iteration}, case seed {case_seed}")
+                raise
+    print(f"{iterations} iterations passed (seed {seed})")
+
+
+if __name__ == "__main__":
+    # Usage: python fuzz_serialization.py [iterations] [seed]
+    main(*map(int, sys.argv[1:3]))
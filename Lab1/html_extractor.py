@@ -0,0 +1,117 @@
+from html.parser import HTMLParser
+
+FEATURE_KEY = 'adPage__content__features__key'
+FEATURE_VALUE = 'adPage__content__features__value'
+PRICE_VALUE = 'adPage__content__price-feature__prices__price__value'
+PRICE_CURRENCY = 'adPage__content__price-feature__prices__price__currency'
+LISTING_ITEM = 'ads-list-photo-item'
+
+
+def has_class(attrs, class_name):
+    """Check whether a tag's attribute list carries the given CSS class."""
+    for name, value in attrs:
+        if name == 'class' and value and class_name in value.split():
+            return True
+    return False
+
+
+class ProductPageExtractor(HTMLParser):
+    """Collect the feature, price and currency spans of an ad page in one pass.
+
+    Only the text of the spans we care about is kept; no tree is built.
+    Matches the BeautifulSoup lookups it replaces: every feature key gets
+    the first value span that follows it ("-" if there is none), and the
+    first price and currency spans win.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.features = {}
+        self.price = None
+        self.currency = None
+        self.pending_keys = []  # keys still waiting for their value span
+        self.active = []  # [class, open span depth, text parts] for spans being captured
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'span':
+            return
+
+        for capture in self.active:
+            capture[1] += 1
+
+        for class_name in (FEATURE_KEY, FEATURE_VALUE, PRICE_VALUE, PRICE_CURRENCY):
+            if has_class(attrs, class_name):
+                self.active.append([class_name, 1, []])
+
+    def handle_endtag(self, tag):
+        if tag != 'span' or not self.active:
+            return
+
+        for capture in self.active:
+            capture[1] -= 1
+
+        # Captures close innermost first
+        while self.active and self.active[-1][1] == 0:
+            class_name, _, parts = self.active.pop()
+            self._finish(class_name, ''.join(parts).strip())
+
+    def handle_data(self, data):
+        for capture in self.active:
+            capture[2].append(data)
+
+    def _finish(self, class_name, text):
+        if class_name == FEATURE_KEY:
+            self.features[text] = "-"
+            self.pending_keys.append(text)
+        elif class_name == FEATURE_VALUE:
+            for key in self.pending_keys:
+                self.features[key] = text
+            self.pending_keys.clear()
+        elif class_name == PRICE_VALUE:
+            if self.price is None:
+                self.price = text
+        elif self.currency is None:
+            self.currency = text
+
+
+class ListingPageExtractor(HTMLParser):
+    """Collect the ad links of a listing page in one pass.
+
+    For each <li class="ads-list-photo-item"> the href of its first <a> is
+    kept, in document order. Items whose first link has no href are skipped.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.items = []  # [open li depth, first link seen] for items being scanned
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'li':
+            for item in self.items:
+                item[0] += 1
+            if has_class(attrs, LISTING_ITEM):
+                self.items.append([1, False])
+        elif tag == 'a':
+            for item in self.items:
+                if not item[1]:
+                    item[1] = True
+                    href = dict(attrs).get('href', False)
+                    if href is not False:
+                        self.links.append(href or '')
+
+    def handle_endtag(self, tag):
+        if tag != 'li' or not self.items:
+            return
+
+        for item in self.items:
+            item[0] -= 1
+        self.items = [item for item in self.items if item[0] > 0]
+
+
+def extract(extractor, chunks):
+    """Feed an iterable of text chunks to an extractor and return it."""
+    for chunk in chunks:
+        extractor.feed(chunk)
+    extractor.close()
+    return extractor
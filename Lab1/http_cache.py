@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = ".http_cache"
+CACHE_TTL = 6 * 60 * 60  # seconds before a cached page is revalidated
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+
+class HTTPCache:
+    """On-disk cache of page bodies keyed by URL.
+
+    Fresh entries (younger than ttl) are served without any request. Stale
+    entries are revalidated with If-None-Match / If-Modified-Since, and a
+    304 reply reuses the stored body. The total size on disk is bounded by
+    max_bytes, evicting least recently used pages first.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # url -> metadata, least recently used first
+        self.total_bytes = 0
+
+        # Counters for the crawl report
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+        self.time_saved = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+    def fetch_text(self, url, send):
+        """Return the body of url as text, going to the network only when needed.
+
+        send(headers) must perform the GET request with the extra headers and
+        return an HTTPResponse, or None if the request failed.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+
+        if entry is not None and time.time() - entry["stored_at"] < self.ttl:
+            body = self._read_body(entry)
+            if body is not None:
+                with self.lock:
+                    self.hits += 1
+                    self.bytes_saved += entry["size"]
+                    self.time_saved += entry.get("fetch_time", 0.0)
+                return body.decode(entry["charset"], errors="replace")
+
+        start = time.perf_counter()
+        response = send(self._conditional_headers(entry))
+        if response is None:
+            return None
+
+        if response.status == 304 and entry is not None:
+            with response:
+                response.read()  # no body, but marks the connection reusable
+            body = self._read_body(entry)
+            if body is not None:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.revalidated += 1
+                    self.bytes_saved += entry["size"]
+                    self.time_saved += max(0.0, entry.get("fetch_time", 0.0) - elapsed)
+                    entry["stored_at"] = time.time()
+                return body.decode(entry["charset"], errors="replace")
+
+            # The body file is gone, fall back to a full download
+            response = send(None)
+            if response is None:
+                return None
+
+        with response:
+            body = response.read()
+            charset = response.charset
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.misses += 1
+                self.bytes_downloaded += len(body)
+
+            if response.status == 200 and "no-store" not in response.headers.get("cache-control", ""):
+                self._store(url, body, charset, response.headers, elapsed)
+
+        return body.decode(charset, errors="replace")
+
+    def report(self):
+        """Summarize how much the cache saved during this run."""
+        requests = self.hits + self.revalidated + self.misses
+        hit_rate = (self.hits + self.revalidated) / requests * 100 if requests else 0.0
+        return (
+            f"Cache: {self.hits} hits, {self.revalidated} revalidated (304), {self.misses} misses "
+            f"({hit_rate:.1f}% served from cache), {self.evictions} evictions\n"
+            f"Cache: saved {self.bytes_saved / 1024:.1f} KiB and ~{self.time_saved:.2f} s, "
+            f"downloaded {self.bytes_downloaded / 1024:.1f} KiB"
+        )
+
+    def save(self):
+        """Write the index to disk so the next run can reuse the cached pages."""
+        with self.lock:
+            index = list(self.entries.items())
+        tmp_path = os.path.join(self.directory, "index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(tmp_path, os.path.join(self.directory, "index.json"))
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, "index.json"), encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        for url, entry in index:
+            self.entries[url] = entry
+            self.total_bytes += entry["size"]
+        self._evict()
+
+    @staticmethod
+    def _conditional_headers(entry):
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _body_path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    @staticmethod
+    def _read_body(entry):
+        try:
+            with open(entry["path"], "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _store(self, url, body, charset, headers, fetch_time):
+        path = self._body_path(url)
+        # Write to a temporary file first so readers never see a partial body
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(body)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            old = self.entries.pop(url, None)
+            if old is not None:
+                self.total_bytes -= old["size"]
+            self.entries[url] = {
+                "path": path,
+                "size": len(body),
+                "charset": charset,
+                "etag": headers.get("etag"),
+                "last_modified": headers.get("last-modified"),
+                "stored_at": time.time(),
+                "fetch_time": fetch_time,  # what a full download cost, for the time saved estimate
+            }
+            self.total_bytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        # Drop least recently used pages until the cache fits in max_bytes
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            self.evictions += 1
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
@@ -0,0 +1,88 @@
+import socket
+import ssl
+import threading
+
+from http_stream import HTTPResponse, format_request
+
+
+class ConnectionPool:
+    """Keep idle HTTP/1.1 connections open per host so later requests skip connect and TLS."""
+
+    def __init__(self, max_idle_per_host=8, timeout=30):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.context = ssl.create_default_context()
+        self.lock = threading.Lock()
+        self.idle = {}  # (host, port, use_ssl) -> [sock, ...]
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    def request(self, host, port, path, use_ssl=True, headers=None):
+        """Send a GET request over a pooled connection and return its HTTPResponse.
+
+        The connection goes back to the pool when the response is closed
+        after its body has been read.
+        """
+        key = (host, port, use_ssl)
+        sock = self._acquire(key)
+
+        if sock is not None:
+            try:
+                return self._send(key, sock, host, path, headers)
+            except OSError:
+                # The server may have closed the idle connection, retry once on a fresh one
+                pass
+
+        return self._send(key, self._connect(host, port, use_ssl), host, path, headers)
+
+    def close(self):
+        """Close every idle connection."""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for socks in idle.values():
+            for sock in socks:
+                sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _acquire(self, key):
+        with self.lock:
+            socks = self.idle.get(key)
+            return socks.pop() if socks else None
+
+    def _release(self, key, sock):
+        with self.lock:
+            socks = self.idle.setdefault(key, [])
+            if len(socks) < self.max_idle_per_host:
+                socks.append(sock)
+                return
+        sock.close()
+
+    def _connect(self, host, port, use_ssl):
+        sock = socket.create_connection((host, port), timeout=self.timeout)
+        if use_ssl:
+            sock = self.context.wrap_socket(sock, server_hostname=host)
+        with self.lock:
+            self.connections_opened += 1
+        return sock
+
+    def _send(self, key, sock, host, path, headers):
+        with self.lock:
+            self.requests_sent += 1
+
+        def on_close(reusable):
+            if reusable:
+                self._release(key, sock)
+            else:
+                sock.close()
+
+        try:
+            sock.sendall(format_request(host, path, keep_alive=True, headers=headers))
+            return HTTPResponse(sock, on_close)
+        except Exception:
+            sock.close()
+            raise
@@ -0,0 +1,247 @@
+import codecs
+import zlib
+
+BUFFER_SIZE = 64 * 1024
+
+
+def format_request(host, path, keep_alive=False, headers=None):
+    """Build the bytes of an HTTP/1.1 GET request."""
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"Accept-Encoding: gzip, deflate\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+    )
+    for name, value in (headers or {}).items():
+        request += f"{name}: {value}\r\n"
+    return f"{request}\r\n".encode()
+
+
+class HTTPResponse:
+    """Incrementally read one HTTP/1.1 response from a socket.
+
+    The status line and headers are parsed once when the response is
+    created. The body is read on demand through a single reusable buffer,
+    either as a stream of chunks (iter_body / iter_text) or in one go
+    (read / text). on_close(reusable) is called when the response is
+    closed, with reusable telling whether the socket can serve another
+    request; without it the socket is closed.
+    """
+
+    def __init__(self, sock, on_close=None, buffer_size=BUFFER_SIZE):
+        self.sock = sock
+        self.on_close = on_close
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # unread data is buffer[start:end]
+        self.end = 0
+        self.consumed = False
+        self.closed = False
+        self._read_head()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the socket, handing it back to its owner if it can be reused."""
+        if self.closed:
+            return
+        self.closed = True
+        # Leftover bytes would belong to no request, so such a socket is not reused
+        reusable = self.keep_alive and self.consumed and self.start == self.end
+        if self.on_close is not None:
+            self.on_close(reusable)
+        else:
+            self.sock.close()
+
+    @property
+    def charset(self):
+        """Character set declared in Content-Type, UTF-8 by default."""
+        for param in self.headers.get("content-type", "").split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "charset" and value:
+                return value.strip('"')
+        return "utf-8"
+
+    def iter_raw(self):
+        """Yield the body with transfer-encoding removed, as views into the read buffer.
+
+        Each view is only valid until the next one is requested.
+        """
+        if self.consumed or not self.has_body:
+            self.consumed = True
+            return
+        if self.chunked:
+            while True:
+                size = int(self._readline().split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    break
+                yield from self._iter_exact(size)
+                self._readline()  # CRLF after the chunk data
+            # Skip optional trailer headers up to the final blank line
+            while self._readline() not in (b"\r\n", b"\n"):
+                pass
+        elif self.content_length is not None:
+            yield from self._iter_exact(self.content_length)
+        else:
+            yield from self._iter_until_close()
+        self.consumed = True
+
+    def iter_body(self):
+        """Yield the decoded body (gzip/deflate removed) chunk by chunk."""
+        decompressor = None
+        for chunk in self.iter_raw():
+            if self.content_encoding in ("gzip", "deflate"):
+                if decompressor is None:
+                    decompressor = _decompressor(self.content_encoding, chunk)
+                chunk = decompressor.decompress(chunk)
+            if chunk:
+                yield chunk
+        if decompressor is not None:
+            tail = decompressor.flush()
+            if tail:
+                yield tail
+
+    def iter_text(self, encoding=None):
+        """Yield the body as text chunks, decoding multi-byte characters across chunk edges."""
+        decoder = codecs.getincrementaldecoder(encoding or self.charset)(errors="replace")
+        for chunk in self.iter_body():
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def read(self):
+        """Read the whole decoded body into a single bytearray."""
+        if self.content_length is not None and not self.chunked and not self.content_encoding \
+                and self.has_body and not self.consumed:
+            # Known size: receive straight into a preallocated body buffer
+            body = bytearray(self.content_length)
+            target = memoryview(body)
+            pos = min(self.end - self.start, self.content_length)
+            target[:pos] = self.view[self.start:self.start + pos]
+            self.start += pos
+            while pos < self.content_length:
+                received = self.sock.recv_into(target[pos:])
+                if not received:
+                    raise ConnectionError("Connection closed in the middle of the body")
+                pos += received
+            self.consumed = True
+            return body
+
+        body = bytearray()
+        for chunk in self.iter_body():
+            body += chunk
+        return body
+
+    def text(self, encoding=None):
+        """Read the whole body as a string."""
+        return self.read().decode(encoding or self.charset, errors="replace")
+
+    def _read_head(self):
+        # Receive until the blank line that ends the headers
+        scan_from = 0
+        while True:
+            head_end = self.buffer.find(b"\r\n\r\n", scan_from, self.end)
+            if head_end != -1:
+                break
+            scan_from = max(0, self.end - 3)
+            if not self._fill():
+                raise ConnectionError("Connection closed before the response headers ended")
+
+        lines = bytes(self.view[:head_end]).decode("latin-1").split("\r\n")
+        self.start = head_end + 4
+
+        self.version, status, *reason = lines[0].split(None, 2)
+        self.status = int(status)
+        self.reason = reason[0] if reason else ""
+        self.headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            self.headers[name.strip().lower()] = value.strip()
+
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            self.keep_alive = connection == "keep-alive"
+        else:
+            self.keep_alive = connection != "close"
+
+        self.has_body = not (self.status in (204, 304) or 100 <= self.status < 200)
+        self.chunked = "chunked" in self.headers.get("transfer-encoding", "").lower()
+        length = self.headers.get("content-length")
+        self.content_length = int(length) if length is not None and not self.chunked else None
+        self.content_encoding = self.headers.get("content-encoding", "").lower()
+        if self.content_encoding == "identity":
+            self.content_encoding = ""
+        if self.has_body and not self.chunked and self.content_length is None:
+            # No framing information, the body ends when the server closes the connection
+            self.keep_alive = False
+
+    def _fill(self):
+        """Receive more data after the unread window, returning the number of bytes read."""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.end == len(self.buffer):
+            if self.start:
+                # Move the unread window to the front of the buffer
+                size = self.end - self.start
+                self.view[:size] = self.view[self.start:self.end]
+                self.start, self.end = 0, size
+            else:
+                # A single line or header block larger than the buffer
+                self.view.release()
+                self.buffer.extend(bytes(len(self.buffer)))
+                self.view = memoryview(self.buffer)
+        received = self.sock.recv_into(self.view[self.end:])
+        self.end += received
+        return received
+
+    def _readline(self):
+        while True:
+            newline = self.buffer.find(b"\n", self.start, self.end)
+            if newline != -1:
+                line = bytes(self.view[self.start:newline + 1])
+                self.start = newline + 1
+                return line
+            if not self._fill():
+                raise ConnectionError("Connection closed in the middle of a chunked body")
+
+    def _iter_exact(self, size):
+        while size:
+            if self.start == self.end:
+                self.start = self.end = 0
+                received = self.sock.recv_into(self.view[:min(size, len(self.buffer))])
+                if not received:
+                    raise ConnectionError("Connection closed in the middle of the body")
+                size -= received
+                yield self.view[:received]
+            else:
+                take = min(size, self.end - self.start)
+                self.start += take
+                size -= take
+                yield self.view[self.start - take:self.start]
+
+    def _iter_until_close(self):
+        if self.start < self.end:
+            yield self.view[self.start:self.end]
+        self.start = self.end = 0
+        while True:
+            received = self.sock.recv_into(self.view)
+            if not received:
+                return
+            yield self.view[:received]
+
+
+def _decompressor(encoding, first_chunk):
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # "deflate" is meant to be zlib-wrapped, but some servers send a raw deflate stream
+    header = bytes(first_chunk[:2])
+    if len(header) == 2 and header[0] & 0x0F == 8 and int.from_bytes(header, "big") % 31 == 0:
+        return zlib.decompressobj(zlib.MAX_WBITS)
+    return zlib.decompressobj(-zlib.MAX_WBITS)
@@ -1,89 +1,165 @@
+import os
 import socket
 import ssl
-from bs4 import BeautifulSoup
-from functools import reduce
+import sys
+from functools import partial
 from datetime import datetime
+from collections import OrderedDict
+from contextlib import ExitStack
+from columnar import ProductBatch
+from concurrent_fetch import fetch_stream, fetch_with_retry
+from http_cache import HTTPCache
+from http_pool import ConnectionPool
+from http_stream import HTTPResponse, format_request
+from html_extractor import ListingPageExtractor, ProductPageExtractor, extract
+from pipeline import Pipeline
+from writers import JSONWriter, NDJSONWriter, XMLWriter
 
 # Conversion rates
 MDL_TO_EUR = 1 / 19  # 1 EUR = 19 MDL
-
-
-def fetch_data_via_socket(host, port, path):
-    """Fetch data from a website using TCP sockets."""
+# EUR value of one unit of each currency (anything missing is taken to be EUR)
+EUR_RATES = {
+    "EUR": 1.0,
+    "MDL": MDL_TO_EUR,
+}
+# Accepted price range in EUR
+PRICE_RANGE_EUR = (100, 15000)
+
+# Number of product pages fetched in parallel (1 keeps the serial path)
+CONCURRENCY = 8
+# Per-host request rate cap for the concurrent mode (None disables it)
+REQUESTS_PER_SECOND = 10
+
+LISTING_PATH = "/ro/list/transport/motorcycles"
+# Number of listing pages to crawl (None follows pagination to the end of the category)
+MAX_PAGES = None
+# Directory the JSON, NDJSON and XML outputs are streamed to
+OUTPUT_DIR = "output"
+OUTPUT_FILES = {
+    "products.json": JSONWriter,
+    "products.ndjson": NDJSONWriter,
+    "products.xml": XMLWriter,
+}
+# How many recent product URLs are remembered to skip ads repeated across pages
+SEEN_URLS_WINDOW = 5000
+
+
+def fetch_data_via_socket(host, port, path, use_ssl=True, timeout=30, headers=None):
+    """Fetch data from a website using TCP sockets.
+
+    Returns an HTTPResponse whose body is read on demand; close it (or use
+    it as a context manager) to release the socket.
+    """
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
 
-    # Wrap the socket with SSL for HTTPS
-    context = ssl.create_default_context()
-    with context.wrap_socket(sock, server_hostname=host) as ssock:
-        try:
-            ssock.connect((host, port))
-        except Exception as e:
-            print(f"Error connecting to {host}:{port} - {e}")
-            return None
-
-        # Prepare and send GET request
-        request = (
-            f"GET {path} HTTP/1.1\r\n"
-            f"Host: {host}\r\n"
-            f"Connection: close\r\n\r\n"
-        )
-        ssock.sendall(request.encode())
+    if use_ssl:
+        # Wrap the socket with SSL for HTTPS
+        context = ssl.create_default_context()
+        sock = context.wrap_socket(sock, server_hostname=host)
 
-        # Receive the response
-        response = b""
-        while True:
-            part = ssock.recv(4096)
-            if not part:
-                break
-            response += part
+    try:
+        sock.connect((host, port))
+    except Exception as e:
+        print(f"Error connecting to {host}:{port} - {e}")
+        sock.close()
+        return None
 
-    return response
+    try:
+        # Send the GET request, the headers are parsed as soon as they arrive
+        sock.sendall(format_request(host, path, headers=headers))
+        return HTTPResponse(sock)
+    except Exception:
+        sock.close()
+        raise
 
 
 def extract_body(response):
-    """Extract the body from the HTTP response."""
-    response_str = response.decode('utf-8')
-    header, _, body = response_str.partition("\r\n\r\n")
-    return body
+    """Stream the body of the HTTP response as text chunks, releasing the socket at the end."""
+    with response:
+        yield from response.iter_text()
 
 
-def fetch_product_details(product_url):
+def fetch_product_details(product_url, host="999.md", port=443, use_ssl=True, pool=None, cache=None):
     """Fetch details of a single product."""
-    host = "999.md"
-    port = 443  # HTTPS port
     path = product_url
 
-    # Fetch data via socket for product details
-    response = fetch_data_via_socket(host, port, path)
+    def send(headers=None):
+        # Fetch data via socket for product details, reusing a pooled connection if given
+        if pool is not None:
+            return pool.request(host, port, path, use_ssl, headers)
+        return fetch_data_via_socket(host, port, path, use_ssl, headers=headers)
+
+    if cache is not None:
+        scheme = "https" if use_ssl else "http"
+        url = product_url if "://" in product_url else f"{scheme}://{host}:{port}{product_url}"
+        body = cache.fetch_text(url, send)
+        if body is None:
+            return None
+        chunks = [body]
+    else:
+        response = send()
+        if response is None:
+            return None
+        chunks = extract_body(response)
+
+    # Extract product data while the page streams in
+    page = extract(ProductPageExtractor(), chunks)
+    product_data = dict(page.features)
+
+    # Extract price and currency
+    if page.price is not None and page.currency is not None:
+        price_value = validate_price_field(page.price)
+
+        if price_value is not None:
+            product_data["Price"] = price_value
+            product_data["Currency"] = page.currency
+
+    return product_data
+
+
+def fetch_listing_links(path, host="999.md", port=443, use_ssl=True, pool=None):
+    """Fetch a listing page and return the ad links on it."""
+    if pool is not None:
+        response = pool.request(host, port, path, use_ssl)
+    else:
+        response = fetch_data_via_socket(host, port, path, use_ssl)
 
     if response is None:
         return None
 
-    body = extract_body(response)
-    soup = BeautifulSoup(body, 'html.parser')
+    # Collect the ad links while the listing page streams in
+    return extract(ListingPageExtractor(), extract_body(response)).links
 
-    # Extract product data
-    product_data = {}
 
-    for feature in soup.find_all('span', class_='adPage__content__features__key'):
-        key = feature.text.strip()
-        value_tag = feature.find_next('span', class_='adPage__content__features__value')
-        value = value_tag.text.strip() if value_tag else "-"
-        product_data[key] = value
+def iter_product_urls(fetch_links, path, max_pages=None):
+    """Follow the pagination of a category, yielding product URLs one page at a time."""
+    seen = OrderedDict()  # bounded window of recent URLs, promoted ads repeat on every page
+    previous_links = None
+    page = 1
 
-    # Extract price and currency
-    price_value_tag = soup.find('span', class_='adPage__content__price-feature__prices__price__value')
-    currency_tag = soup.find('span', class_='adPage__content__price-feature__prices__price__currency')
+    while max_pages is None or page <= max_pages:
+        links = fetch_with_retry(fetch_links, f"{path}?page={page}")
 
-    if price_value_tag and currency_tag:
-        price_value = validate_price_field(price_value_tag.text.strip())
-        currency_value = currency_tag.text.strip()
+        if links is None:
+            print(f"Failed to retrieve listing page {page}.")
+            return
 
-        if price_value is not None:
-            product_data["Price"] = price_value
-            product_data["Currency"] = currency_value
+        # Past the last page the site returns no ads or repeats the last page
+        if not links or links == previous_links:
+            return
 
-    return product_data
+        for href in links:
+            product_url = f"https://999.md{href}"
+            if product_url in seen:
+                continue
+            seen[product_url] = None
+            if len(seen) > SEEN_URLS_WINDOW:
+                seen.popitem(last=False)
+            yield product_url
+
+        previous_links = links
+        page += 1
 
 
 def validate_price_field(price):
@@ -94,92 +170,112 @@ def validate_price_field(price):
         return None
 
 
-def convert_to_eur(price, currency):
-    """Convert MDL to EUR, if already EUR return as is."""
-    return price * MDL_TO_EUR if currency == "MDL" else price
+def convert_to_eur(price, currency, rates=EUR_RATES):
+    """Convert a price to EUR with the rate table, if already EUR return as is."""
+    return price * rates.get(currency, 1.0)
 
 
-def filter_products(products):
+def in_price_range(product, price_range=PRICE_RANGE_EUR, rates=EUR_RATES):
+    """Check whether a product's price falls in the accepted EUR range."""
+    low, high = price_range
+    return "Price" in product and low <= convert_to_eur(product["Price"], product["Currency"], rates) <= high
+
+
+def filter_products(products, price_range=PRICE_RANGE_EUR, rates=EUR_RATES):
     """Filter products in a specific price range."""
-    filtered_products = [p for p in products if
-                         "Price" in p and 100 <= convert_to_eur(p["Price"], p["Currency"]) <= 15000]
+    # Convert and filter the whole price column at once instead of product by product
+    batch = ProductBatch.from_products(products)
+    eur = batch.eur_prices(rates)
+    indices = batch.in_range(*price_range, rates, eur)
 
-    total_price_eur = reduce(lambda acc, p: acc + convert_to_eur(p["Price"], p["Currency"]), filtered_products, 0)
+    filtered_products = batch.select(indices)
+    total_price_eur = float(eur[indices].sum())
 
     return filtered_products, total_price_eur
 
 
-def serialize_to_json(products):
+def serialize_to_json(products, file=sys.stdout):
     """Serialize products to JSON format."""
-    json_output = "[\n"
-
-    for product in products:
-        json_output += "  {\n"
-        for key, value in product.items():
-            json_output += f'    "{key}": "{value}",\n'
-        json_output = json_output.rstrip(",\n") + "\n"  # Remove last comma
-        json_output += "  },\n"
+    if file is sys.stdout:
+        print("JSON Output:")
+    with JSONWriter(file) as writer:
+        for product in products:
+            writer.write(product)
 
-    json_output += "]"
 
-    print("JSON Output:")
-    print(json_output)
+def serialize_to_ndjson(products, file=sys.stdout):
+    """Serialize products to newline-delimited JSON, one product per line."""
+    if file is sys.stdout:
+        print("NDJSON Output:")
+    with NDJSONWriter(file) as writer:
+        for product in products:
+            writer.write(product)
 
 
-def serialize_to_xml(products):
+def serialize_to_xml(products, file=sys.stdout):
     """Serialize products to XML format."""
-    xml_output = "<products>\n"
+    if file is sys.stdout:
+        print("XML Output:")
+    with XMLWriter(file) as writer:
+        for product in products:
+            writer.write(product)
 
-    for product in products:
-        xml_output += "  <product>\n"
-        for key, value in product.items():
-            xml_output += f'    <{key}>{value}</{key}>\n'
-        xml_output += "  </product>\n"
 
-    xml_output += "</products>"
-
-    print("XML Output:")
-    print(xml_output)
-
-
-def main():
+def main(concurrency=CONCURRENCY, max_pages=MAX_PAGES):
     host = "999.md"
     port = 443  # HTTPS port
-    path = "/ro/list/transport/motorcycles"
-
-    response = fetch_data_via_socket(host, port, path)
-
-    if response is None:
-        print("Failed to retrieve data.")
-        return
-
-    body = extract_body(response)
-
-    # Parse the HTML content
-    soup = BeautifulSoup(body, 'html.parser')
-
-    products_list = []
-
-    for product in soup.find_all('li', class_='ads-list-photo-item'):
-        link = product.find('a')
-
-        if link and 'href' in link.attrs:
-            product_url = f"https://999.md{link['href']}"
-            product_details = fetch_product_details(product_url)
-
-            if product_details and "Price" in product_details:
-                products_list.append(product_details)
-
-    # Filter products based on price range and calculate total price
-    filtered_products, total_price_eur = filter_products(products_list)
-
-    for product in filtered_products:
-        print(product)
-
-    serialize_to_json(filtered_products)
-    serialize_to_xml(filtered_products)
-
-    print(f"\nTotal Price of Filtered Products (EUR): {total_price_eur:.2f}")
+    path = LISTING_PATH
+
+    # Only the price and currency columns of the filtered products are kept, for the summary
+    prices = ProductBatch(keep_records=False)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # Product pages share keep-alive connections instead of a new TLS handshake each,
+    # and unchanged pages are served from the on-disk cache
+    with ExitStack() as stack:
+        pool = stack.enter_context(ConnectionPool(max_idle_per_host=concurrency))
+        cache = stack.enter_context(HTTPCache())
+        writers = [
+            stack.enter_context(writer_class(stack.enter_context(
+                open(os.path.join(OUTPUT_DIR, file_name), "w", encoding="utf-8"))))
+            for file_name, writer_class in OUTPUT_FILES.items()
+        ]
+
+        def sink(product):
+            print(product)
+            prices.append(product)
+            # Every product is written out as it arrives, nothing is kept around
+            for writer in writers:
+                writer.write(product)
+
+        fetch = partial(fetch_product_details, pool=pool, cache=cache)
+        fetch_links = partial(fetch_listing_links, host=host, port=port, pool=pool)
+
+        # list pages -> detail fetch -> validate -> filter -> sink, each stage pulling from the previous one
+        pipeline = Pipeline()
+        product_urls = pipeline.stage("list pages", iter_product_urls(fetch_links, path, max_pages))
+
+        if concurrency > 1:
+            all_details = fetch_stream(product_urls, fetch, max_workers=concurrency,
+                                       requests_per_second=REQUESTS_PER_SECOND)
+        else:
+            all_details = map(fetch, product_urls)
+        all_details = pipeline.stage("fetch details", all_details)
+
+        products = pipeline.stage("validate", (p for p in all_details if p and "Price" in p))
+        # Filter products based on price range
+        products = pipeline.stage("filter", (p for p in products if in_price_range(p)))
+
+        pipeline.run(products, sink)
+
+    print(pipeline.report())
+    print(f"Wrote {writers[0].count} products to {', '.join(OUTPUT_FILES)} in {OUTPUT_DIR}/")
+    stats = prices.stats(EUR_RATES)
+    print(f"\nTotal Price of Filtered Products (EUR): {stats['total']:.2f}")
+    if stats["count"]:
+        print(f"Mean {stats['mean']:.2f}, min {stats['min']:.2f}, median {stats['p50']:.2f}, "
+              f"p90 {stats['p90']:.2f}, max {stats['max']:.2f} EUR")
+    print(cache.report())
     print(f"UTC Timestamp: {datetime.utcnow()}")
 
 if __name__ == "__main__":
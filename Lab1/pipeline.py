@@ -0,0 +1,77 @@
+import time
+
+
+class StageMetrics:
+    """Item count and time spent producing items for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0  # time spent in next() on this stage, upstream stages included
+
+
+class Pipeline:
+    """A chain of generator stages pulled by a sink.
+
+    Every stage is a lazy iterable over the previous one, so an item is only
+    produced when the next stage asks for it: a slow stage holds back the
+    ones before it and nothing queues up in between. Memory stays bounded
+    by what a single stage keeps in flight, however many items go through.
+    """
+
+    def __init__(self, progress_interval=5.0):
+        self.progress_interval = progress_interval
+        self.stages = []
+        self.started = None
+
+    def stage(self, name, iterable):
+        """Register a stage and return its metered iterator."""
+        metrics = StageMetrics(name)
+        self.stages.append(metrics)
+        return self._metered(metrics, iterable)
+
+    def run(self, items, sink):
+        """Pull every item out of the last stage into sink(item)."""
+        self.started = time.perf_counter()
+        last_progress = self.started
+
+        for item in items:
+            sink(item)
+
+            now = time.perf_counter()
+            if now - last_progress >= self.progress_interval:
+                last_progress = now
+                print(self.progress())
+
+    def progress(self):
+        """One-line summary of how many items each stage has produced."""
+        elapsed = time.perf_counter() - self.started
+        counts = ", ".join(f"{stage.name}: {stage.items}" for stage in self.stages)
+        return f"[{elapsed:7.1f} s] {counts}"
+
+    def report(self):
+        """Per-stage item counts, throughput and own processing time."""
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Pipeline finished in {elapsed:.1f} s"]
+        upstream_busy = 0.0
+        for stage in self.stages:
+            # A stage's busy time includes the stages before it, subtract them to get its own share
+            own = max(0.0, stage.busy - upstream_busy)
+            upstream_busy = stage.busy
+            rate = stage.items / elapsed if elapsed else 0.0
+            lines.append(f"  {stage.name:<15} {stage.items:8d} items  {rate:8.1f} items/s  {own:8.1f} s own time")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _metered(metrics, iterable):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                metrics.busy += time.perf_counter() - start
+                return
+            metrics.busy += time.perf_counter() - start
+            metrics.items += 1
+            yield item
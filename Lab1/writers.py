@@ -0,0 +1,94 @@
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+# Control characters that XML 1.0 cannot carry at all, even as character references
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff\ud800-\udfff]")
+# A raw \r would be read back as \n, a reference keeps it
+_XML_ENTITIES = {"\r": "&#13;"}
+
+
+class RecordWriter:
+    """Base class for writers that stream records to a text file one at a time.
+
+    Nothing but the current record is held in memory, so the output can be
+    any size. Use as a context manager, or call close() to finish the
+    document; the underlying file is left open.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        self._write(record)
+        self.count += 1
+
+    def close(self):
+        pass
+
+    def _write(self, record):
+        raise NotImplementedError
+
+
+class JSONWriter(RecordWriter):
+    """Stream records as an indented JSON array, keeping value types."""
+
+    def _write(self, record):
+        self.file.write("[\n" if self.count == 0 else ",\n")
+        text = json.dumps(record, ensure_ascii=False, indent=2)
+        self.file.write("  " + text.replace("\n", "\n  "))
+
+    def close(self):
+        self.file.write("\n]\n" if self.count else "[]\n")
+
+
+class NDJSONWriter(RecordWriter):
+    """Stream records as newline-delimited JSON, one compact object per line."""
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self.file.write("\n")
+
+
+class XMLWriter(RecordWriter):
+    """Stream records as <product> elements inside a <products> document."""
+
+    def __init__(self, file, root="products", element="product"):
+        super().__init__(file)
+        self.root = root
+        self.element = element
+        self.file.write(f"<{root}>\n")
+
+    def _write(self, record):
+        lines = [f"  <{self.element}>\n"]
+        for key, value in record.items():
+            tag = xml_name(key)
+            # Keys that are not valid element names keep their original spelling in an attribute
+            attr = f" name={quoteattr(_INVALID_XML_CHARS.sub('', str(key)), _XML_ENTITIES)}" if tag != key else ""
+            lines.append(f"    <{tag}{attr}>{xml_text(value)}</{tag}>\n")
+        lines.append(f"  </{self.element}>\n")
+        self.file.write("".join(lines))
+
+    def close(self):
+        self.file.write(f"</{self.root}>\n")
+
+
+def xml_name(key):
+    """Turn a product field name such as "Putere (CP)" into a valid XML element name."""
+    # Only ASCII letters are safe: parsers differ on which other letters a name may use, e.g. ț
+    name = re.sub(r"[^\w.-]", "_", str(key), flags=re.ASCII)
+    if not re.match(r"[^\W\d]", name, flags=re.ASCII) or name.lower().startswith("xml"):
+        name = "_" + name
+    return name
+
+
+def xml_text(value):
+    """Escape a value as XML character data, dropping characters XML cannot represent."""
+    return escape(_INVALID_XML_CHARS.sub("", str(value)), _XML_ENTITIES)
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from log_store import DURABILITY_POLICIES
+from tcp_server import DURABILITY, FRAME_HEADER, encode_frame
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tcp_server.py')
+ENGINES = ['threaded', 'selector']
+CLIENTS = 100
+IDLE_CONNECTIONS = 1000
+DURATION = 5.0
+# Framed commands each client keeps in flight; 0 sends one text command per round trip
+PIPELINE = 0
+MESSAGE = 'write load test message'
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def raise_file_limit():
+    """Allow as many open sockets as the hard limit, for the idle connections."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def start_server(engine, port, workdir, durability=DURABILITY):
+    """Run tcp_server.py in its own process, so it does not share the load generator's GIL."""
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, '--engine', engine, '--host', '127.0.0.1', '--port', str(port),
+         '--backlog', '1024', '--durability', durability],
+        cwd=workdir, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f'{engine} server did not start')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def thread_count(process):
+    try:
+        with open(f'/proc/{process.pid}/status') as status:
+            for line in status:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def client(port, deadline, latencies):
+    """Send one command at a time and wait for its one-line response, until the deadline."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    message = MESSAGE.encode('utf-8')
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(message)
+            if not await reader.readline():
+                break
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def pipelined_client(port, deadline, latencies, depth):
+    """Send depth framed commands at once, then read their responses, until the deadline.
+
+    Every command of a round is recorded with the round's latency.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    frames = encode_frame(MESSAGE) * depth
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(frames)
+            for _ in range(depth):
+                size, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                await reader.readexactly(size)
+            latencies.extend([time.perf_counter() - start] * depth)
+    except asyncio.IncompleteReadError:
+        pass
+    finally:
+        writer.close()
+
+
+async def open_idle(port, count):
+    connections = []
+    for _ in range(count):
+        connections.append(await asyncio.open_connection('127.0.0.1', port))
+    return connections
+
+
+async def load(process, port, clients, idle, duration, pipeline=PIPELINE):
+    """Hold idle connections open while clients send requests.
+
+    Returns the latencies, the elapsed time and the server's thread count
+    while every connection was open.
+    """
+    idle_connections = await open_idle(port, idle)
+    latencies = []
+    start = time.perf_counter()
+    if pipeline:
+        busy = asyncio.gather(*(pipelined_client(port, start + duration, latencies, pipeline)
+                                for _ in range(clients)))
+    else:
+        busy = asyncio.gather(*(client(port, start + duration, latencies) for _ in range(clients)))
+    await asyncio.sleep(duration / 2)
+    threads = thread_count(process)
+    await busy
+    elapsed = time.perf_counter() - start
+    for _, writer in idle_connections:
+        writer.close()
+    return latencies, elapsed, threads
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure requests/sec and latency of the tcp_server engines.')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--clients', type=int, default=CLIENTS, help='connections sending requests')
+    parser.add_argument('--idle', type=int, default=IDLE_CONNECTIONS, help='connections held open but silent')
+    parser.add_argument('--duration', type=float, default=DURATION, help='seconds of load per engine')
+    parser.add_argument('--pipeline', type=int, default=PIPELINE,
+                        help='framed commands in flight per client; 0 uses the text protocol')
+    parser.add_argument('--durability', choices=DURABILITY_POLICIES, default=DURABILITY,
+                        help='when the server acknowledges writes')
+    args = parser.parse_args()
+
+    limit = raise_file_limit()
+    # Both ends of every connection live on this machine
+    if 2 * (args.clients + args.idle) + 100 > limit:
+        raise SystemExit(f'{args.clients + args.idle} connections need more than the {limit} open files allowed')
+
+    protocol = f'framed, {args.pipeline} pipelined' if args.pipeline else 'text'
+    print(f'{args.clients} busy + {args.idle} idle connections ({protocol}, {args.durability} durability), '
+          f'{args.duration:.0f} s per engine')
+    print(f"{'engine':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'threads':>8}")
+    for engine in args.engines:
+        with tempfile.TemporaryDirectory() as workdir:
+            port = free_port()
+            process = start_server(engine, port, workdir, args.durability)
+            try:
+                latencies, elapsed, threads = asyncio.run(
+                    load(process, port, args.clients, args.idle, args.duration, args.pipeline))
+            finally:
+                stop_server(process)
+        latencies.sort()
+        if not latencies:
+            print(f'{engine:<10} no responses')
+            continue
+        print(f'{engine:<10} {len(latencies):9,} {len(latencies) / elapsed:9,.0f} '
+              f'{percentile(latencies, 50) * 1000:8.2f} {percentile(latencies, 99) * 1000:8.2f} '
+              f'{threads if threads is not None else "-":>8}')
+
+
+if __name__ == '__main__':
+    # Usage: python benchmark_tcp_server.py [--clients 100] [--idle 1000] [--duration 5] [--pipeline 16]
+    #                                   [--durability none|batch|interval]
+    main()
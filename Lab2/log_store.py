@@ -0,0 +1,368 @@
+import mmap
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# A segment stops taking appends once it holds this many bytes
+SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_SUFFIX = '.log'
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# When GroupCommitWriter acknowledges a write: once written to the OS, fsynced with its batch,
+# or fsynced by a timer shared by every batch written in the meantime
+DURABILITY_POLICIES = ('none', 'batch', 'interval')
+FSYNC_INTERVAL = 0.01  # seconds between fsyncs under the 'interval' policy
+# Records GroupCommitWriter appends in one batch at most
+MAX_BATCH_RECORDS = 10000
+
+
+class ReadWriteLock:
+    """Any number of readers, or one writer.
+
+    A waiting writer holds back new readers, so a steady stream of reads
+    cannot starve it.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing_now = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def reading(self):
+        with self.condition:
+            while self.writing_now or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing_now or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing_now = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing_now = False
+                self.condition.notify_all()
+
+
+class Segment:
+    """One file of the log: the records from offset base on, one per line.
+
+    positions holds the byte position where each record starts, plus the
+    end of the last one, so record i is file[positions[i]:positions[i + 1]].
+    """
+
+    def __init__(self, path, base):
+        self.path = path
+        self.base = base
+        self.positions = array('Q', [0])
+        self.file = open(path, 'rb')
+        self.map = None
+        self.map_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions) - 1
+
+    @property
+    def size(self):
+        return self.positions[-1]
+
+    def scan(self):
+        """Index the records already in the file, dropping a last line left unfinished by a crash."""
+        position = 0
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(SCAN_CHUNK_SIZE)
+            if not chunk:
+                break
+            start = 0
+            while True:
+                newline = chunk.find(b'\n', start)
+                if newline < 0:
+                    break
+                self.positions.append(position + newline + 1)
+                start = newline + 1
+            position += len(chunk)
+        if position != self.size:
+            os.truncate(self.path, self.size)
+
+    def view(self, end):
+        """A read-only map of the file covering at least its first end bytes."""
+        current = self.map
+        if current is None or len(current) < end:
+            with self.map_lock:
+                if self.map is None or len(self.map) < end:
+                    # Map the file as it is now; an older map stays valid for readers still holding it
+                    self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                current = self.map
+        return current
+
+    def close(self):
+        self.map = None
+        self.file.close()
+
+
+class LogStore:
+    """Append-only store of text records, split into segment files with an in-memory offset index.
+
+    Records are numbered from 0 in append order. Each segment file is
+    named after the offset of its first record and holds one record per
+    line. The index keeps the byte position of every record, so reading
+    any range slices just those bytes out of a memory map of the
+    segment, without scanning or copying the rest of the file.
+
+    Appends are serialized among themselves. They write to the active
+    segment, then publish the new positions under the write side of a
+    ReadWriteLock, which is held only that long. Readers share the read
+    side and never see a record before its bytes are in the file.
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = ReadWriteLock()
+        self.append_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self.segments = []
+        self.bases = []
+        self.count = 0
+        names = sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            segment = Segment(os.path.join(directory, name), int(name[:-len(SEGMENT_SUFFIX)]))
+            segment.scan()
+            self._add_segment(segment)
+        if not self.segments:
+            self._add_segment(self._create_segment(0))
+            self._sync_directory()
+        self.writer = open(self.segments[-1].path, 'ab')
+
+    def __len__(self):
+        return self.count
+
+    def _create_segment(self, base):
+        path = os.path.join(self.directory, f'{base:020d}{SEGMENT_SUFFIX}')
+        open(path, 'ab').close()
+        return Segment(path, base)
+
+    def _sync_directory(self):
+        """Make new segment files survive a crash, not only their contents."""
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _add_segment(self, segment):
+        self.segments.append(segment)
+        self.bases.append(segment.base)
+        self.count = segment.base + len(segment)
+
+    def append(self, records):
+        """Append text records and return the offset of the first one."""
+        lines = []
+        for record in records:
+            if '\n' in record:
+                raise ValueError('Records cannot contain newlines')
+            lines.append(record.encode('utf-8') + b'\n')
+
+        with self.append_lock:
+            segment = self.segments[-1]
+            if segment.size >= self.segment_size:
+                segment = self._roll()
+            positions = []
+            end = segment.size
+            for line in lines:
+                end += len(line)
+                positions.append(end)
+            self.writer.write(b''.join(lines))
+            self.writer.flush()
+
+            with self.lock.writing():
+                first = self.count
+                segment.positions.extend(positions)
+                self.count += len(lines)
+            return first
+
+    def _roll(self):
+        """Start a new segment after the full one; called with append_lock held."""
+        os.fsync(self.writer.fileno())
+        self.writer.close()
+        segment = self._create_segment(self.count)
+        self._sync_directory()
+        self.writer = open(segment.path, 'ab')
+        with self.lock.writing():
+            self.segments.append(segment)
+            self.bases.append(segment.base)
+        return segment
+
+    def sync(self):
+        """Force every record appended so far to disk."""
+        with self.append_lock:
+            os.fsync(self.writer.fileno())
+
+    def read(self, offset, count):
+        """Up to count records from offset on; fewer if the log ends first."""
+        if offset < 0 or count < 0:
+            raise ValueError('Offset and count must not be negative')
+        with self.lock.reading():
+            return self._read(offset, min(offset + count, self.count))
+
+    def tail(self, count):
+        """The offset of the last count records, and the records themselves."""
+        if count < 0:
+            raise ValueError('Count must not be negative')
+        with self.lock.reading():
+            start = max(0, self.count - count)
+            return start, self._read(start, self.count)
+
+    def _read(self, offset, end):
+        records = []
+        index = bisect_right(self.bases, offset) - 1
+        while offset < end:
+            segment = self.segments[index]
+            first = offset - segment.base
+            last = min(end - segment.base, len(segment))
+            start_byte, end_byte = segment.positions[first], segment.positions[last]
+            if end_byte > start_byte:
+                data = segment.view(end_byte)[start_byte:end_byte]
+                records.extend(data.decode('utf-8', errors='replace').split('\n')[:-1])
+            offset = segment.base + last
+            index += 1
+        return records
+
+    def close(self):
+        with self.append_lock:
+            self.writer.close()
+            for segment in self.segments:
+                segment.close()
+
+
+class GroupCommitWriter:
+    """Appends records submitted from many threads to a LogStore in batches, from one thread of its own.
+
+    Everything submitted while a batch is being written goes into the next
+    one, as a single append on the store's long-lived file handle, so
+    concurrent writers share the cost of the write and of the fsync.
+    submit() returns a Future that resolves to the record's offset once
+    its batch meets the durability policy:
+
+    'none'      written to the operating system, which flushes it to disk
+                in its own time
+    'batch'     fsynced, one fsync per batch
+    'interval'  fsynced by an fsync that runs every interval seconds while
+                records are waiting for one, so acknowledgements can take
+                up to that long
+    """
+
+    def __init__(self, store, durability='batch', interval=FSYNC_INTERVAL):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability {durability!r}; choose from {', '.join(DURABILITY_POLICIES)}")
+        self.store = store
+        self.durability = durability
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.queue = []  # (record, future) waiting for the next batch
+        self.unsynced = []  # (future, offset) written but waiting for the next 'interval' fsync
+        self.last_sync = time.monotonic()
+        self.closed = False
+        self.batches = 0
+        self.syncs = 0
+        self.thread = threading.Thread(target=self.run, name='group-commit', daemon=True)
+        self.thread.start()
+
+    def submit(self, record):
+        if '\n' in record:
+            raise ValueError('Records cannot contain newlines')
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('Writer is closed')
+            self.queue.append((record, future))
+            self.condition.notify()
+        return future
+
+    def write(self, record):
+        """Append one record and wait until it is durable; return its offset."""
+        return self.submit(record).result()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    if not self.unsynced:
+                        self.condition.wait()
+                        continue
+                    remaining = self.last_sync + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.queue[:MAX_BATCH_RECORDS]
+                del self.queue[:MAX_BATCH_RECORDS]
+                finished = self.closed and not self.queue
+
+            if batch:
+                self.commit(batch)
+            if self.unsynced and (finished or time.monotonic() >= self.last_sync + self.interval):
+                self.sync_waiting()
+            if finished:
+                return
+
+    def commit(self, batch):
+        try:
+            first = self.store.append([record for record, _ in batch])
+            if self.durability == 'batch':
+                self.store.sync()
+                self.syncs += 1
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        written = [(future, first + i) for i, (_, future) in enumerate(batch)]
+        if self.durability == 'interval':
+            if not self.unsynced:
+                # The interval runs from the first write that needs an fsync
+                self.last_sync = time.monotonic()
+            self.unsynced.extend(written)
+        else:
+            for future, offset in written:
+                future.set_result(offset)
+
+    def sync_waiting(self):
+        waiting, self.unsynced = self.unsynced, []
+        self.last_sync = time.monotonic()
+        try:
+            self.store.sync()
+        except Exception as e:
+            for future, _ in waiting:
+                future.set_exception(e)
+            return
+        self.syncs += 1
+        for future, offset in waiting:
+            future.set_result(offset)
+
+    def close(self):
+        """Write and acknowledge everything submitted so far, then stop the thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
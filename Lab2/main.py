@@ -1,6 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import exc, literal, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import base64
+import binascii
+import io
+import json
+import operator
 import os
+import re
+import threading
+import time
+import uuid
+
+from read_cache import CACHE_MAX_ENTRIES, CACHE_TTL, LocalBackend, LRUCache, ReadThroughCache, RedisBackend
 
 app = Flask(__name__)
 
@@ -32,10 +49,748 @@ class MotoData(db.Model):
     price = db.Column(db.Float)
     currency = db.Column(db.String(10))
 
+    # (column, id) indexes serve both the filters and the keyset pagination of /read
+    __table_args__ = tuple(
+        db.Index(f'ix_moto_data_{column}_id', column, 'id')
+        for column in ('marca', 'model', 'anul_fabricatiei', 'price', 'currency')
+    )
+
+# Per-group summary of moto_data kept up to date by every write path, so /stats never scans moto_data
+class MotoStats(db.Model):
+    __tablename__ = 'moto_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    # JSON of [marca, tip_moto, anul_fabricatiei]; unique even when some of them are NULL
+    group_key = db.Column(db.String(255), nullable=False, unique=True)
+    marca = db.Column(db.String(80))
+    tip_moto = db.Column(db.String(80))
+    anul_fabricatiei = db.Column(db.Integer)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    priced_count = db.Column(db.Integer, nullable=False, default=0)
+    price_eur_sum = db.Column(db.Float, nullable=False, default=0.0)
+    price_eur_min = db.Column(db.Float)
+    price_eur_max = db.Column(db.Float)
+
+# Column name -> (key in the scraped product, value type)
+PRODUCT_FIELDS = {
+    "marca": ("Marcă", str),
+    "model": ("Model", str),
+    "tip_oferta": ("Tip ofertă", str),
+    "inmatriculare": ("Înmatriculare", str),
+    "stare": ("Stare", str),
+    "tip_moto": ("Tip moto", str),
+    "anul_fabricatiei": ("Anul fabricației", int),
+    "capacitate_cilindrica": ("Capacitate cilindrică", int),
+    "rulaj": ("Rulaj", int),
+    "putere": ("Putere (CP)", int),
+    "culoarea": ("Culoarea", str),
+    "cutia_de_viteze": ("Cutia de viteze", str),
+    "price": ("Price", float),
+    "currency": ("Currency", str),
+}
+REQUIRED_COLUMNS = ("marca", "model")
+# Scraped numbers come with units and thousands separators, e.g. "1 250 cm³"
+LEADING_NUMBER = re.compile(r"\s*(-?\d[\d\s]*(?:[.,]\d+)?)")
+
+# EUR value of one unit of each currency (anything missing is taken to be EUR)
+EUR_RATES = {
+    "EUR": 1.0,
+    "€": 1.0,
+    "MDL": 1 / 19,
+}
+STATS_GROUP_COLUMNS = ('marca', 'tip_moto', 'anul_fabricatiei')
+
+# Columns /update and the batch endpoints may change: all but id
+UPDATABLE_COLUMNS = tuple(PRODUCT_FIELDS)
+# Ids a batch request may name; each is a bind parameter of the statement
+MAX_BATCH_IDS = 10000
+
+# Bulk import settings
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+MAX_FINISHED_JOBS = 100
+
+
+def parse_number(value, kind):
+    """Convert a JSON number or a scraped string such as "12 500 km" to an int or float."""
+    if isinstance(value, bool):
+        raise ValueError(f"expected a number, got {value!r}")
+    if isinstance(value, (int, float)):
+        return kind(value)
+    match = LEADING_NUMBER.match(str(value))
+    if not match:
+        raise ValueError(f"expected a number, got {value!r}")
+    number = re.sub(r"\s", "", match.group(1)).replace(",", ".")
+    return int(float(number)) if kind is int else float(number)
+
+
+def row_from_product(data):
+    """Validate a product dict and return the MotoData column mapping for it.
+
+    Keys may be the scraper's field names ("Marcă") or the column names
+    ("marca"). Missing numbers default to 0 like /create always did.
+    Raises ValueError naming the offending field.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"expected an object, got {type(data).__name__}")
+    row = {}
+    for column, (key, kind) in PRODUCT_FIELDS.items():
+        value = data.get(key, data.get(column))
+        if kind is str:
+            if value is not None and not isinstance(value, str):
+                value = str(value)
+            if column in REQUIRED_COLUMNS and not value:
+                raise ValueError(f"{key} is required")
+            row[column] = value
+        else:
+            try:
+                row[column] = parse_number(0 if value is None else value, kind)
+            except (ValueError, OverflowError) as e:
+                raise ValueError(f"{key}: {e}") from None
+    return row
+
+
+def price_eur(row):
+    """The row's price in EUR, or None if it has no price."""
+    if row.get('price') is None:
+        return None
+    return row['price'] * EUR_RATES.get(row.get('currency'), 1.0)
+
+
+def price_eur_expression(price=MotoData.price, currency=MotoData.currency):
+    """SQL for price_eur() over moto_data, or over other price and currency expressions."""
+    rate = db.case(
+        *[(currency == code, rate) for code, rate in EUR_RATES.items() if rate != 1.0],
+        else_=1.0,
+    )
+    return price * rate
+
+
+def stats_fields(entry):
+    """The columns of a MotoData entry that the summary depends on."""
+    return {column: getattr(entry, column) for column in STATS_GROUP_COLUMNS + ('price', 'currency')}
+
+
+def apply_stats(added=(), removed=()):
+    """Fold added and removed rows into moto_stats in the current transaction.
+
+    The rows are dicts holding at least the group columns, price and
+    currency; for an update pass the old values as removed and the new
+    ones as added. The row changes themselves must already be flushed:
+    when a removed price was a group's minimum or maximum, that bound is
+    recomputed from the group's remaining rows.
+    """
+    deltas = {}
+    for rows, sign in ((removed, -1), (added, 1)):
+        for row in rows:
+            eur = price_eur(row)
+            fold_stats(deltas, tuple(row.get(column) for column in STATS_GROUP_COLUMNS), sign,
+                       1, int(eur is not None), eur or 0.0, eur, eur)
+    write_stats(deltas)
+
+
+def fold_stats(deltas, key, sign, count, priced, total, low, high):
+    """Add (sign 1) or remove (sign -1) count rows of group key to the moto_stats deltas.
+
+    priced of the rows have a price; their EUR prices sum to total and
+    range from low to high.
+    """
+    delta = deltas.setdefault(key, {"count": 0, "priced": 0, "sum": 0.0, "min": None, "max": None,
+                                    "removed_min": None, "removed_max": None})
+    delta["count"] += sign * count
+    if not priced:
+        return
+    delta["priced"] += sign * priced
+    delta["sum"] += sign * total
+    low_key, high_key = ("min", "max") if sign > 0 else ("removed_min", "removed_max")
+    delta[low_key] = low if delta[low_key] is None else min(delta[low_key], low)
+    delta[high_key] = high if delta[high_key] is None else max(delta[high_key], high)
+
+
+def write_stats(deltas):
+    """Apply deltas built by fold_stats to moto_stats in the current transaction."""
+    if not deltas:
+        return
+
+    # Make sure every group has a row, then lock them all for the read-modify-write
+    group_keys = {key: json.dumps(key, ensure_ascii=False) for key in deltas}
+    table = MotoStats.__table__
+    insert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+    db.session.execute(insert(table).values([
+        dict(zip(STATS_GROUP_COLUMNS, key), group_key=group_key, count=0, priced_count=0, price_eur_sum=0.0)
+        for key, group_key in group_keys.items()
+    ]).on_conflict_do_nothing(index_elements=['group_key']))
+    stats = {row.group_key: row for row in MotoStats.query.filter(
+        MotoStats.group_key.in_(group_keys.values())).with_for_update().populate_existing()}
+
+    for key, delta in deltas.items():
+        row = stats[group_keys[key]]
+        row.count += delta["count"]
+        row.priced_count += delta["priced"]
+        row.price_eur_sum += delta["sum"]
+        if row.count <= 0:
+            db.session.delete(row)
+            continue
+        if row.priced_count <= 0:
+            row.price_eur_sum, row.price_eur_min, row.price_eur_max = 0.0, None, None
+            continue
+        if delta["removed_min"] is not None and (delta["removed_min"] <= row.price_eur_min
+                                                 or delta["removed_max"] >= row.price_eur_max):
+            # A removed price may have been the bound; ask the group's remaining rows
+            conditions = [
+                getattr(MotoData, column).is_(None) if value is None else getattr(MotoData, column) == value
+                for column, value in zip(STATS_GROUP_COLUMNS, key)
+            ]
+            eur = price_eur_expression()
+            row.price_eur_min, row.price_eur_max = db.session.query(
+                db.func.min(eur), db.func.max(eur)).filter(*conditions).one()
+        if delta["min"] is not None:
+            row.price_eur_min = delta["min"] if row.price_eur_min is None else min(row.price_eur_min, delta["min"])
+            row.price_eur_max = delta["max"] if row.price_eur_max is None else max(row.price_eur_max, delta["max"])
+
+
+def rebuild_stats():
+    """Recompute moto_stats from a full scan of moto_data, e.g. for a database that predates it."""
+    MotoStats.query.delete()
+    eur = price_eur_expression()
+    groups = [getattr(MotoData, column) for column in STATS_GROUP_COLUMNS]
+    for *key, count, priced, total, low, high in db.session.query(
+            *groups, db.func.count(), db.func.count(MotoData.price), db.func.sum(eur),
+            db.func.min(eur), db.func.max(eur)).group_by(*groups):
+        db.session.add(MotoStats(group_key=json.dumps(key, ensure_ascii=False), count=count, priced_count=priced,
+                                 price_eur_sum=total or 0.0, price_eur_min=low, price_eur_max=high,
+                                 **dict(zip(STATS_GROUP_COLUMNS, key))))
+    db.session.commit()
+
+
+def validated_updates(data):
+    """Check {column: value} updates against UPDATABLE_COLUMNS and convert the values to column types."""
+    if not isinstance(data, dict) or not data:
+        raise ValueError("Nothing to update")
+    unknown = [column for column in data if column not in UPDATABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Cannot update {', '.join(unknown)}; updatable columns: {', '.join(UPDATABLE_COLUMNS)}")
+    values = {}
+    for column, value in data.items():
+        kind = PRODUCT_FIELDS[column][1]
+        if value is None or value == "":
+            if column in REQUIRED_COLUMNS:
+                raise ValueError(f"{column} is required")
+            values[column] = None
+        elif kind is str:
+            values[column] = str(value)
+        else:
+            try:
+                values[column] = parse_number(value, kind)
+            except (ValueError, OverflowError) as e:
+                raise ValueError(f"{column}: {e}") from None
+    return values
+
+
+def batch_conditions(data):
+    """WHERE conditions for the rows a batch request names, by "ids" or by a "filter" like /read's."""
+    ids = data.get("ids")
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+            raise ValueError('"ids" must be a non-empty list of integers')
+        if len(ids) > MAX_BATCH_IDS:
+            raise ValueError(f'At most {MAX_BATCH_IDS} "ids" per request; use a "filter" for more')
+        return [MotoData.id.in_(ids)]
+    conditions = data.get("filter")
+    if not isinstance(conditions, dict) or not conditions:
+        # Refuse to touch every row by accident
+        raise ValueError('Name the rows with "ids" or a non-empty "filter"')
+    allowed = EXACT_FILTERS + tuple(column + suffix for column in RANGE_FILTERS for suffix in ('_min', '_max'))
+    unknown = [name for name in conditions if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown filters {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return filter_conditions(conditions)
+
+
+def batch_stats(conditions, values=None):
+    """Lock the rows a batch touches; return how many there are and their moto_stats deltas.
+
+    One grouped query sums the rows per summary group, without loading
+    them. Each group is removed and, for an update setting values, added
+    back under the group and price the values give it.
+    """
+    table = MotoData.__table__
+    locked = select(*[table.c[column] for column in STATS_GROUP_COLUMNS + ('price', 'currency')]).where(
+        *conditions).with_for_update().subquery()
+    groups = [locked.c[column] for column in STATS_GROUP_COLUMNS]
+    prices = [price_eur_expression(locked.c.price, locked.c.currency)]
+    if values is not None:
+        prices.append(price_eur_expression(
+            literal(values['price'], table.c.price.type) if 'price' in values else locked.c.price,
+            literal(values['currency'], table.c.currency.type) if 'currency' in values else locked.c.currency))
+    aggregates = [aggregate(eur) for eur in prices for aggregate in
+                  (db.func.count, db.func.sum, db.func.min, db.func.max)]
+
+    matched = 0
+    deltas = {}
+    for row in db.session.execute(select(*groups, db.func.count(), *aggregates).group_by(*groups)):
+        key, count, sums = tuple(row[:len(groups)]), row[len(groups)], row[len(groups) + 1:]
+        matched += count
+        fold_stats(deltas, key, -1, count, sums[0], sums[1] or 0.0, sums[2], sums[3])
+        if values is not None:
+            new_key = tuple(values.get(column, old) for column, old in zip(STATS_GROUP_COLUMNS, key))
+            fold_stats(deltas, new_key, 1, count, sums[4], sums[5] or 0.0, sums[6], sums[7])
+    return matched, deltas
+
+
+def check_batch(matched, affected):
+    if affected != matched:
+        # Another transaction added a row matching the filter after batch_stats counted them
+        raise RuntimeError("Rows changed while the batch ran; try again")
+
+
+def invalidate_batch(data):
+    """Drop the rows a committed batch request changed, and every list page, from the read cache."""
+    if data.get("ids") is not None:
+        read_cache.invalidate_entries(data["ids"])
+    else:
+        # The rows a filter matched are not known by id
+        read_cache.invalidate_all()
+
+
+class ImportJob:
+    """Progress and per-row errors of one background bulk import."""
+
+    def __init__(self, source):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.status = "queued"
+        self.rows_read = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.message = None
+        self.started = None
+        self.finished = None
+
+    def add_error(self, row, message, rows=1):
+        self.failed += rows
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "rows_read": self.rows_read,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "message": self.message,
+            "elapsed": round(end - self.started, 3) if self.started else 0.0,
+        }
+
+
+# One worker: imports run one after another, so they never contend for the database writer
+import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-import")
+import_jobs = OrderedDict()
+import_jobs_lock = threading.Lock()
+
+
+def iter_products(lines):
+    """Yield (row number, product or parse error) from JSON array or NDJSON text lines.
+
+    NDJSON is parsed one line at a time, so a bad line only fails that row.
+    A document starting with [ is a JSON array and is parsed as a whole.
+    """
+    lines = iter(lines)
+    first = ""
+    for first in lines:
+        if first.strip():
+            break
+    if first.lstrip().startswith("["):
+        products = json.loads(first + "".join(lines))
+        if not isinstance(products, list):
+            raise ValueError("expected a JSON array")
+        yield from enumerate(products, 1)
+        return
+
+    def ndjson_lines():
+        yield first
+        yield from lines
+
+    number = 0
+    for line in ndjson_lines():
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def run_import(job, open_lines):
+    """Validate and insert the products in batches of IMPORT_BATCH_SIZE, one transaction each."""
+    job.status = "running"
+    job.started = time.time()
+    try:
+        with app.app_context(), open_lines() as lines:
+            batch = []
+            for number, product in iter_products(lines):
+                job.rows_read += 1
+                try:
+                    if isinstance(product, Exception):
+                        raise ValueError(f"invalid JSON: {product}")
+                    batch.append(row_from_product(product))
+                except ValueError as e:
+                    job.add_error(number, str(e))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    insert_batch(job, batch)
+                    batch = []
+            if batch:
+                insert_batch(job, batch)
+        job.status = "done"
+    except Exception as e:
+        job.status = "failed"
+        job.message = str(e)
+    finally:
+        job.finished = time.time()
+
+
+def insert_batch(job, rows):
+    try:
+        db.session.bulk_insert_mappings(MotoData, rows)
+        apply_stats(added=rows)
+        db.session.commit()
+        read_cache.invalidate_lists()
+        job.inserted += len(rows)
+    except Exception as e:
+        db.session.rollback()
+        first = job.rows_read - len(rows) + 1
+        job.add_error(f"{first}-{job.rows_read}", f"batch rejected by the database: {e}", len(rows))
+
+
+def start_import(source, open_lines):
+    """Queue an import job; open_lines() must return a context manager over the text lines."""
+    job = ImportJob(source)
+    with import_jobs_lock:
+        import_jobs[job.id] = job
+        # Forget the oldest finished jobs
+        finished = [job_id for job_id, old in import_jobs.items() if old.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del import_jobs[job_id]
+    import_executor.submit(run_import, job, open_lines)
+    return job
+
+
+def import_response(job):
+    return jsonify({"status": "accepted", "job_id": job.id, "progress": f"/bulk/{job.id}"}), 202
+
+
+# /read pagination, filtering, sorting and projection
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+# Larger pages, up to this many rows, are exports and are streamed
+MAX_EXPORT_SIZE = 100000
+STREAM_BATCH_SIZE = 1000
+ENTRY_FIELDS = tuple(column.name for column in MotoData.__table__.columns)
+SORT_COLUMNS = ('id', 'marca', 'model', 'anul_fabricatiei', 'price', 'currency')
+EXACT_FILTERS = ('marca', 'model', 'anul_fabricatiei', 'currency')
+# ?price_min=&price_max=, ?anul_fabricatiei_min=&anul_fabricatiei_max=
+RANGE_FILTERS = {'anul_fabricatiei': int, 'price': float}
+
+
+def encode_cursor(sort, descending, value, entry_id):
+    """Opaque cursor for the position after (value, entry_id) in the given ordering."""
+    raw = json.dumps([sort, descending, value, entry_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort, descending, value, entry_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+    if sort not in SORT_COLUMNS or not isinstance(entry_id, int):
+        raise ValueError("Invalid cursor")
+    return sort, bool(descending), value, entry_id
+
+
+def selected_fields(args):
+    """Column names asked for with ?fields=marca,price, or all of them."""
+    if not args.get('fields'):
+        return ENTRY_FIELDS
+    fields = tuple(dict.fromkeys(name.strip() for name in args['fields'].split(',') if name.strip()))
+    unknown = [name for name in fields if name not in ENTRY_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields {', '.join(unknown)}; choose from {', '.join(ENTRY_FIELDS)}")
+    return fields
+
+
+def filter_conditions(args):
+    """WHERE conditions for the exact-match and range filters in the query string."""
+    table = MotoData.__table__
+    conditions = [table.c[column] == args[column] for column in EXACT_FILTERS if column in args]
+    for column, kind in RANGE_FILTERS.items():
+        for suffix, compare in (('_min', operator.ge), ('_max', operator.le)):
+            value = args.get(column + suffix)
+            if value is not None:
+                try:
+                    value = kind(value)
+                except ValueError:
+                    raise ValueError(f"{column + suffix} must be a number") from None
+                conditions.append(compare(table.c[column], value))
+    return conditions
+
+
+def keyset_rows(columns, conditions, sort, descending, after, limit, offset=0):
+    """Yield up to limit rows of the given columns in page order, after the (value, id) key.
+
+    Rows are ordered by the sort column, NULLs last, then by id. Unlike
+    OFFSET the database seeks straight to the key through the (column, id)
+    index, so deep pages cost the same as the first one. Rows come out of
+    the database in batches rather than all at once.
+    """
+    table = MotoData.__table__
+    column, id_column = table.c[sort], table.c.id
+    direction = operator.methodcaller('desc' if descending else 'asc')
+    query = select(*columns).where(*conditions)
+    id_after = None
+    if after:
+        id_after = id_column < after[1] if descending else id_column > after[1]
+
+    def fetch(statement, count):
+        result = db.session.execute(statement.limit(count).execution_options(stream_results=True))
+        return result.yield_per(STREAM_BATCH_SIZE)
+
+    if sort == 'id':
+        if id_after is not None:
+            query = query.where(id_after)
+        yield from fetch(query.order_by(direction(id_column)).offset(offset), limit)
+        return
+
+    # Seek through the non-NULL values with a (column, id) row comparison the
+    # index can range-scan, then carry on into the NULLs ordered by id
+    produced = 0
+    if not after or after[0] is not None:
+        seek = query.where(column.isnot(None))
+        if after:
+            key, last_key = tuple_(column, id_column), tuple_(*after)
+            seek = seek.where(key < last_key if descending else key > last_key)
+        for row in fetch(seek.order_by(direction(column), direction(id_column)), limit):
+            produced += 1
+            yield row
+    if produced < limit:
+        nulls = query.where(column.is_(None))
+        if after and after[0] is None:
+            nulls = nulls.where(id_after)
+        yield from fetch(nulls.order_by(direction(id_column)), limit - produced)
+
+
+def page_limit(args):
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer") from None
+    if not 1 <= limit <= MAX_EXPORT_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_EXPORT_SIZE}")
+    return limit
+
+
+def read_page(args, fields):
+    """Rows of the requested fields for one /read page and the cursor for the next page.
+
+    Every row starts with the requested fields; the sort column and id
+    follow when they were not requested, for the cursor. Pages up to
+    MAX_PAGE_SIZE are returned as a list. Larger ones are exports and come
+    back as a lazy iterator, after a pass over just the index keys has found
+    where the page ends, so the cursor is known before streaming starts.
+    """
+    limit = page_limit(args)
+    cursor = args.get('cursor')
+    after = None
+    if cursor:
+        sort, descending, last_value, last_id = decode_cursor(cursor)
+        after = (last_value, last_id)
+    else:
+        sort = args.get('sort', 'id')
+        descending = args.get('order', 'asc') == 'desc'
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+    # Kept for older clients with the default id order; deep offsets get slower, prefer the cursor
+    offset = int(args['offset']) if 'offset' in args and not cursor and sort == 'id' else 0
+
+    table = MotoData.__table__
+    key_names = list(dict.fromkeys((sort, 'id')))
+    names = list(fields) + [name for name in key_names if name not in fields]
+    columns = [table.c[name] for name in names]
+    conditions = filter_conditions(args)
+
+    def cursor_after(key):
+        # key holds the sort value and the id, or just the id when sorting by id
+        return encode_cursor(sort, descending, key[0], key[-1])
+
+    # One row past the page tells whether there is a next page
+    if limit <= MAX_PAGE_SIZE:
+        rows = list(keyset_rows(columns, conditions, sort, descending, after, limit + 1, offset))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = cursor_after([rows[-1][names.index(name)] for name in key_names])
+        return rows, next_cursor
+
+    count = 0
+    tail = deque(maxlen=2)
+    for key in keyset_rows([table.c[name] for name in key_names], conditions, sort, descending,
+                           after, limit + 1, offset):
+        count += 1
+        tail.append(key)
+    next_cursor = cursor_after(tail[0]) if count > limit else None
+    return keyset_rows(columns, conditions, sort, descending, after, limit, offset), next_cursor
+
+
+def stream_entries(rows, fields, ndjson):
+    """Encode rows as NDJSON or a JSON array, one chunk per STREAM_BATCH_SIZE rows."""
+    rows = iter(rows)
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    prefix = "" if ndjson else "["
+    while True:
+        batch = [dict(zip(fields, row)) for row in islice(rows, STREAM_BATCH_SIZE)]
+        if not batch:
+            break
+        if ndjson:
+            yield "".join([encode(entry) + "\n" for entry in batch])
+        else:
+            # Encode the whole batch in one call and drop its brackets
+            yield prefix + encode(batch)[1:-1]
+            prefix = ","
+    if not ndjson:
+        yield "]" if prefix == "," else "[]"
+
+
+def load_entry(entry_id):
+    """Every column of one entry as a dict, or None if there is no such entry."""
+    row = db.session.execute(select(MotoData.__table__).where(MotoData.id == entry_id)).first()
+    return dict(zip(ENTRY_FIELDS, row)) if row else None
+
+
+def load_list_page(args, fields):
+    rows, next_cursor = read_page(args, fields)
+    return {"entries": [dict(zip(fields, row)) for row in rows], "next_cursor": next_cursor}
+
+
+def make_cache_backend(url):
+    """Shared cache backend from CACHE_URL: unset for none, 'local' for the stand-in, or a redis:// URL."""
+    if not url:
+        return None
+    if url == 'local':
+        return LocalBackend()
+    return RedisBackend(url)
+
+
+# Read-through cache in front of /read; every write path invalidates it
+cache_ttl = int(os.getenv('CACHE_TTL', CACHE_TTL))
+read_cache = ReadThroughCache(
+    LRUCache(int(os.getenv('CACHE_MAX_ENTRIES', CACHE_MAX_ENTRIES)), cache_ttl),
+    make_cache_backend(os.getenv('CACHE_URL')),
+    cache_ttl,
+)
+
+
+# Full-text search: the text columns that are indexed, and the facets /search counts
+SEARCH_COLUMNS = ('marca', 'model', 'tip_moto', 'culoarea', 'stare', 'cutia_de_viteze')
+FACET_COLUMNS = ('marca', 'stare', 'cutia_de_viteze')
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+FACET_LIMIT = 20
+# The document Postgres indexes; search queries must use the identical expression to hit the index
+SEARCH_DOCUMENT = " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+SEARCH_VECTOR = f"to_tsvector('simple', {SEARCH_DOCUMENT})"
+# Set by setup_search(): 'fts5', 'tsvector', or 'like' when the database has neither
+search_backend = None
+
+
+def setup_search():
+    """Create the text index for the database in use, and the triggers that keep it in sync.
+
+    SQLite gets an external-content FTS5 table over moto_data, maintained
+    by insert/update/delete triggers, so every write path (ORM, bulk
+    mappings, set-based statements) updates it in the same transaction.
+    Postgres gets a GIN index on the tsvector expression, which it keeps
+    current by itself. Anything else falls back to LIKE scans.
+    """
+    global search_backend
+    columns = ", ".join(SEARCH_COLUMNS)
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS ix_moto_data_search ON moto_data USING GIN ({SEARCH_VECTOR})"))
+        db.session.commit()
+        search_backend = 'tsvector'
+        return
+    if db.engine.dialect.name != 'sqlite':
+        search_backend = 'like'
+        return
+
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'moto_data_fts'")).first()
+    try:
+        db.session.execute(db.text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS moto_data_fts USING fts5({columns}, "
+            f"content='moto_data', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"))
+    except exc.OperationalError:
+        # SQLite built without FTS5
+        db.session.rollback()
+        search_backend = 'like'
+        return
+
+    new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+    add = f"INSERT INTO moto_data_fts(rowid, {columns}) VALUES (new.id, {new_values});"
+    remove = (f"INSERT INTO moto_data_fts(moto_data_fts, rowid, {columns}) "
+              f"VALUES ('delete', old.id, {old_values});")
+    for name, event, body in (
+            ('insert', 'AFTER INSERT', add),
+            ('delete', 'AFTER DELETE', remove),
+            ('update', f'AFTER UPDATE OF {columns}', remove + " " + add)):
+        db.session.execute(db.text(
+            f"CREATE TRIGGER IF NOT EXISTS moto_data_fts_{name} {event} ON moto_data BEGIN {body} END"))
+    if not exists:
+        # Index the rows written before the search table existed
+        db.session.execute(db.text("INSERT INTO moto_data_fts(moto_data_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    search_backend = 'fts5'
+
+
+def search_matches(terms):
+    """Subquery of (id, rank) for the entries containing every term, as a prefix; higher rank is better."""
+    if search_backend == 'fts5':
+        # Quoted terms are taken literally, so user input cannot inject FTS5 query syntax
+        query = " ".join(f'"{term}"*' for term in terms)
+        statement = db.text(
+            "SELECT rowid AS id, -bm25(moto_data_fts) AS rank FROM moto_data_fts WHERE moto_data_fts MATCH :query")
+    elif search_backend == 'tsvector':
+        query = " & ".join(f"{term}:*" for term in terms)
+        statement = db.text(
+            f"SELECT id, ts_rank({SEARCH_VECTOR}, to_tsquery('simple', :query)) AS rank FROM moto_data "
+            f"WHERE {SEARCH_VECTOR} @@ to_tsquery('simple', :query)")
+    else:
+        conditions = [
+            or_(*[getattr(MotoData, column).ilike(f"%{term}%") for column in SEARCH_COLUMNS]) for term in terms
+        ]
+        return select(MotoData.id.label('id'), literal(0.0).label('rank')).where(*conditions).subquery('matches')
+    return statement.bindparams(query=query).columns(id=db.Integer, rank=db.Float).subquery('matches')
+
+
 # Initialize the database tables
 @app.before_first_request
 def create_tables():
     db.create_all()
+    # create_all skips tables that already exist, so add indexes introduced since separately
+    for index in MotoData.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    # Fill the summary table for rows written before it existed
+    if not MotoStats.query.first() and MotoData.query.first():
+        rebuild_stats()
+    setup_search()
 
 # File upload route
 @app.route('/upload', methods=['POST'])
@@ -47,91 +802,172 @@ def upload_file():
     if file.filename == '':
         return jsonify({"status": "error", "message": "No file selected"}), 400
 
-    if file and file.filename.endswith('.json'):
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+    if file and file.filename.endswith(('.json', '.ndjson')):
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(file.filename))
         file.save(file_path)
+        # ?import=1 loads the saved file into the database in the background
+        if request.args.get('import') in ('1', 'true'):
+            return import_response(start_import(file.filename, lambda: open(file_path, encoding='utf-8')))
         return jsonify({"status": "success", "message": f"File '{file.filename}' uploaded successfully!"}), 201
 
-    return jsonify({"status": "error", "message": "Invalid file type, only JSON files are allowed"}), 400
+    return jsonify({"status": "error", "message": "Invalid file type, only JSON and NDJSON files are allowed"}), 400
+
+# Bulk import a JSON array or NDJSON body, or a file previously sent to /upload (?file=name)
+@app.route('/bulk', methods=['POST'])
+def bulk_import():
+    file_name = request.args.get('file')
+    if file_name:
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(file_name))
+        if not os.path.isfile(file_path):
+            return jsonify({"status": "error", "message": f"No uploaded file '{file_name}'"}), 404
+        return import_response(start_import(file_name, lambda: open(file_path, encoding='utf-8')))
+
+    # The body has to be read before the request ends; the worker parses it
+    body = request.get_data(as_text=True)
+    if not body.strip():
+        return jsonify({"status": "error", "message": "Empty request body"}), 400
+    return import_response(start_import("request body", lambda: io.StringIO(body)))
+
+# Progress of a bulk import job
+@app.route('/bulk/<job_id>', methods=['GET'])
+def bulk_import_status(job_id):
+    with import_jobs_lock:
+        job = import_jobs.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
 
 # Add a new entry to the database
 @app.route('/create', methods=['POST'])
 def create_entry():
     data = request.get_json()
     try:
-        entry = MotoData(
-            marca=data.get("Marcă"),
-            model=data.get("Model"),
-            tip_oferta=data.get("Tip ofertă"),
-            inmatriculare=data.get("Înmatriculare"),
-            stare=data.get("Stare"),
-            tip_moto=data.get("Tip moto"),
-            anul_fabricatiei=int(data.get("Anul fabricației", 0)),
-            capacitate_cilindrica=int(data.get("Capacitate cilindrică", 0)),
-            rulaj=int(data.get("Rulaj", 0)),
-            putere=int(data.get("Putere (CP)", 0)),
-            culoarea=data.get("Culoarea"),
-            cutia_de_viteze=data.get("Cutia de viteze"),
-            price=float(data.get("Price", 0)),
-            currency=data.get("Currency")
-        )
-        db.session.add(entry)
+        row = row_from_product(data)
+        db.session.add(MotoData(**row))
+        db.session.flush()
+        apply_stats(added=[row])
         db.session.commit()
+        read_cache.invalidate_lists()
         return jsonify({"status": "success", "message": "Entry created successfully!"}), 201
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
 
-# Get all entries or a specific entry by ID
+# Get all entries or a specific entry by ID; ?fields=marca,price returns only those columns
 @app.route('/read', methods=['GET'])
 def read_entries():
     entry_id = request.args.get('id')
-    offset = int(request.args.get('offset', 0))  # Default offset is 0
-    limit = int(request.args.get('limit', 10))  # Default limit is 10
 
     try:
+        fields = selected_fields(request.args)
         if entry_id:
-            entry = MotoData.query.get(entry_id)
+            entry_id = int(entry_id)
+            entry = read_cache.get_or_load(read_cache.entry_key(entry_id), lambda: load_entry(entry_id))
             if entry:
-                return jsonify({
-                    "id": entry.id,
-                    "marca": entry.marca,
-                    "model": entry.model,
-                    "tip_oferta": entry.tip_oferta,
-                    "inmatriculare": entry.inmatriculare,
-                    "stare": entry.stare,
-                    "tip_moto": entry.tip_moto,
-                    "anul_fabricatiei": entry.anul_fabricatiei,
-                    "capacitate_cilindrica": entry.capacitate_cilindrica,
-                    "rulaj": entry.rulaj,
-                    "putere": entry.putere,
-                    "culoarea": entry.culoarea,
-                    "cutia_de_viteze": entry.cutia_de_viteze,
-                    "price": entry.price,
-                    "currency": entry.currency
-                }), 200
+                return jsonify({name: entry[name] for name in fields}), 200
             return jsonify({"status": "error", "message": "Entry not found"}), 404
         else:
-            entries = MotoData.query.offset(offset).limit(limit).all()
-            return jsonify([{
-                "id": entry.id,
-                "marca": entry.marca,
-                "model": entry.model,
-                "tip_oferta": entry.tip_oferta,
-                "inmatriculare": entry.inmatriculare,
-                "stare": entry.stare,
-                "tip_moto": entry.tip_moto,
-                "anul_fabricatiei": entry.anul_fabricatiei,
-                "capacitate_cilindrica": entry.capacitate_cilindrica,
-                "rulaj": entry.rulaj,
-                "putere": entry.putere,
-                "culoarea": entry.culoarea,
-                "cutia_de_viteze": entry.cutia_de_viteze,
-                "price": entry.price,
-                "currency": entry.currency
-            } for entry in entries]), 200
+            # Filters: marca, model, anul_fabricatiei, currency, price_min/max, anul_fabricatiei_min/max.
+            # Order with sort= and order=asc|desc; the X-Next-Cursor header gives ?cursor= for the next page.
+            # format=ndjson, or a limit above MAX_PAGE_SIZE, streams the rows instead of building the page.
+            ndjson = request.args.get('format') == 'ndjson'
+            if ndjson or page_limit(request.args) > MAX_PAGE_SIZE:
+                rows, next_cursor = read_page(request.args, fields)
+                response = Response(stream_with_context(stream_entries(rows, fields, ndjson)),
+                                    mimetype='application/x-ndjson' if ndjson else 'application/json')
+            else:
+                page = read_cache.get_or_load(read_cache.list_key(request.args),
+                                              lambda: load_list_page(request.args, fields))
+                response = jsonify(page["entries"])
+                next_cursor = page["next_cursor"]
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response, 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
 
+# Read cache hit, miss and eviction counters
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(read_cache.stats()), 200
+
+# Count and EUR price average/min/max, overall or ?group_by=marca,tip_moto,anul_fabricatiei,
+# optionally filtered with ?marca=&tip_moto=&anul_fabricatiei=. Reads only the summary table.
+@app.route('/stats', methods=['GET'])
+def read_stats():
+    group_by = [column.strip() for column in request.args.get('group_by', '').split(',') if column.strip()]
+    unknown = [column for column in group_by if column not in STATS_GROUP_COLUMNS]
+    if unknown:
+        return jsonify({"status": "error", "message": f"Cannot group by {', '.join(unknown)}; "
+                                                      f"choose from {', '.join(STATS_GROUP_COLUMNS)}"}), 400
+
+    columns = [getattr(MotoStats, column) for column in group_by]
+    query = db.session.query(
+        *columns,
+        db.func.coalesce(db.func.sum(MotoStats.count), 0),
+        db.func.coalesce(db.func.sum(MotoStats.priced_count), 0),
+        db.func.sum(MotoStats.price_eur_sum),
+        db.func.min(MotoStats.price_eur_min),
+        db.func.max(MotoStats.price_eur_max),
+    )
+    for column in STATS_GROUP_COLUMNS:
+        if column in request.args:
+            query = query.filter(getattr(MotoStats, column) == request.args[column])
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+
+    result = []
+    for *key, count, priced, total, low, high in query:
+        result.append({
+            **dict(zip(group_by, key)),
+            "count": count,
+            "priced_count": priced,
+            "average_price_eur": round(total / priced, 2) if priced else None,
+            "min_price_eur": round(low, 2) if low is not None else None,
+            "max_price_eur": round(high, 2) if high is not None else None,
+        })
+    return jsonify(result), 200
+
+# Ranked full-text search over brand, model, type, colour, state and gearbox, e.g. ?q=honda negru.
+# Returns facet counts for marca, stare and cutia_de_viteze; those same parameters narrow the results.
+@app.route('/search', methods=['GET'])
+def search_entries():
+    terms = re.findall(r"\w+", request.args.get('q', '').lower())
+    if not terms:
+        return jsonify({"status": "error", "message": "Missing search text in ?q="}), 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+        fields = selected_fields(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+    table = MotoData.__table__
+    matches = search_matches(terms)
+    conditions = [table.c[column] == request.args[column] for column in FACET_COLUMNS if column in request.args]
+
+    def matching(*columns):
+        return select(*columns).select_from(table.join(matches, table.c.id == matches.c.id)).where(*conditions)
+
+    rows = db.session.execute(
+        matching(*[table.c[name] for name in fields], matches.c.rank)
+        .order_by(matches.c.rank.desc(), table.c.id).limit(limit)
+    ).all()
+    total = db.session.execute(matching(db.func.count())).scalar()
+    facets = {}
+    for column in FACET_COLUMNS:
+        counts = db.session.execute(
+            matching(table.c[column], db.func.count().label('count'))
+            .group_by(table.c[column]).order_by(db.desc('count'), table.c[column]).limit(FACET_LIMIT)
+        ).all()
+        facets[column] = [{"value": value, "count": count} for value, count in counts]
+
+    return jsonify({
+        "query": " ".join(terms),
+        "total": total,
+        "results": [{**dict(zip(fields, row)), "rank": round(row[-1], 4)} for row in rows],
+        "facets": facets,
+    }), 200
+
 # Update an entry by ID
 @app.route('/update', methods=['PUT'])
 def update_entry():
@@ -142,9 +978,14 @@ def update_entry():
         return jsonify({"status": "error", "message": "Entry not found"}), 404
 
     try:
-        for field, value in data.items():
+        values = validated_updates(data)
+        old = stats_fields(entry)
+        for field, value in values.items():
             setattr(entry, field, value)
+        db.session.flush()
+        apply_stats(added=[stats_fields(entry)], removed=[old])
         db.session.commit()
+        read_cache.invalidate_entry(entry.id)
         return jsonify({"status": "success", "message": "Entry updated successfully!"}), 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
@@ -158,11 +999,60 @@ def delete_entry():
         return jsonify({"status": "error", "message": "Entry not found"}), 404
 
     try:
+        old = stats_fields(entry)
         db.session.delete(entry)
+        db.session.flush()
+        apply_stats(removed=[old])
         db.session.commit()
+        read_cache.invalidate_entry(entry.id)
         return jsonify({"status": "success", "message": "Entry deleted successfully!"}), 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
 
+# Update many entries with one set-based statement:
+# {"ids": [1, 2]} or {"filter": {"marca": "Honda", "price_max": 500}}, plus {"set": {"currency": "EUR"}}
+@app.route('/batch/update', methods=['PUT'])
+def batch_update():
+    data = request.get_json(silent=True) or {}
+    try:
+        conditions = batch_conditions(data)
+        values = validated_updates(data.get("set"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        matched, deltas = batch_stats(conditions, values)
+        updated = db.session.execute(MotoData.__table__.update().where(*conditions).values(**values)).rowcount
+        check_batch(matched, updated)
+        if any(column in values for column in STATS_GROUP_COLUMNS + ('price', 'currency')):
+            write_stats(deltas)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 400
+    invalidate_batch(data)
+    return jsonify({"status": "success", "matched": matched, "updated": updated}), 200
+
+# Delete many entries with one set-based statement: {"ids": [...]} or {"filter": {...}}
+@app.route('/batch/delete', methods=['DELETE'])
+def batch_delete():
+    data = request.get_json(silent=True) or {}
+    try:
+        conditions = batch_conditions(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        matched, deltas = batch_stats(conditions)
+        deleted = db.session.execute(MotoData.__table__.delete().where(*conditions)).rowcount
+        check_batch(matched, deleted)
+        write_stats(deltas)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 400
+    invalidate_batch(data)
+    return jsonify({"status": "success", "matched": matched, "deleted": deleted}), 200
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
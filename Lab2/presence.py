@@ -0,0 +1,109 @@
+import threading
+from collections import deque
+
+# Messages kept per room for users who join later
+HISTORY_SIZE = 50
+
+
+class Room:
+    def __init__(self, history_size):
+        self.members = {}  # username -> sid
+        self.history = deque(maxlen=history_size)
+
+
+class Presence:
+    """Who is in which chat room, indexed both by room and by client sid.
+
+    A room maps each username in it to the sid that joined with it, and
+    each sid maps the rooms it joined to its username there, so joining,
+    leaving, membership checks and cleaning up after a disconnect cost the
+    same however many users a room has. A room is dropped as soon as its
+    last member leaves. While it exists it keeps its last history_size
+    messages in a ring buffer, to replay to users who join later.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.history_size = history_size
+        self.lock = threading.Lock()
+        self.rooms = {}  # room -> Room
+        self.sessions = {}  # sid -> {room: username}
+
+    def join(self, sid, room, username):
+        """Add username to room for sid.
+
+        False if that username is already in the room, or if sid already
+        joined the room under any name: a client holds one name per room.
+        """
+        with self.lock:
+            if room in self.sessions.get(sid, ()):
+                return False
+            members = self.rooms.setdefault(room, Room(self.history_size)).members
+            if username in members:
+                return False
+            members[username] = sid
+            self.sessions.setdefault(sid, {})[room] = username
+            return True
+
+    def leave(self, sid, room, username):
+        """Remove username from room if sid is the client that joined with it; False otherwise."""
+        with self.lock:
+            current = self.rooms.get(room)
+            if current is None or current.members.get(username) != sid:
+                return False
+            self._remove(sid, room, username)
+            return True
+
+    def disconnect(self, sid):
+        """Remove sid from every room it joined; return the (room, username) pairs it left."""
+        with self.lock:
+            joined = list(self.sessions.get(sid, {}).items())
+            for room, username in joined:
+                self._remove(sid, room, username)
+            return joined
+
+    def _remove(self, sid, room, username):
+        members = self.rooms[room].members
+        del members[username]
+        if not members:
+            del self.rooms[room]
+        session = self.sessions[sid]
+        del session[room]
+        if not session:
+            del self.sessions[sid]
+
+    def record(self, room, message):
+        """Add message to the room's history, if the room has members."""
+        with self.lock:
+            current = self.rooms.get(room)
+            if current is not None:
+                current.history.append(message)
+
+    def history(self, room):
+        with self.lock:
+            current = self.rooms.get(room)
+            return list(current.history) if current is not None else []
+
+
+if __name__ == '__main__':
+    presence = Presence(history_size=3)
+
+    # A client keeps one name per room, so disconnecting leaves nothing behind
+    assert presence.join('s1', 'r', 'alice')
+    assert not presence.join('s1', 'r', 'bob')
+    assert not presence.join('s2', 'r', 'alice')
+    assert presence.join('s2', 'r', 'bob')
+    assert not presence.leave('s1', 'r', 'bob')
+    assert presence.disconnect('s1') == [('r', 'alice')]
+    assert presence.rooms['r'].members == {'bob': 's2'}
+    assert presence.leave('s2', 'r', 'bob')
+    assert not presence.leave('s2', 'r', 'bob')
+    assert presence.rooms == {} and presence.sessions == {}
+
+    # History is a ring buffer, dropped with its room
+    presence.join('s1', 'r', 'alice')
+    for i in range(5):
+        presence.record('r', f'alice: {i}')
+    assert presence.history('r') == ['alice: 2', 'alice: 3', 'alice: 4']
+    presence.disconnect('s1')
+    assert presence.history('r') == [] and presence.rooms == {}
+    print("Presence checks passed")
@@ -0,0 +1,271 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL = 30  # seconds an entry is served before it is reloaded
+CACHE_MAX_ENTRIES = 10000
+GENERATION_KEY = "list-generation"
+SHARED_GENERATION_KEY = "shared-generation"
+
+_MISSING = object()
+
+
+class LRUCache:
+    """In-process cache bounded by entry count, with a time to live per entry.
+
+    When full, the least recently used entry is evicted. Expired entries are
+    dropped when they are next looked up.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return default
+            if item[0] <= time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                return default
+            self.entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class LocalBackend:
+    """Stand-in for a shared cache server such as Redis, kept in this process.
+
+    It has the same get/set/delete/incr interface as RedisBackend and
+    stores values as strings like a network cache would, so tests and
+    single-process deployments can use it in place of a real server.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}  # key -> (expires_at or None, text)
+
+    def get(self, key):
+        with self.lock:
+            item = self.values.get(key)
+            if item is None:
+                return None
+            if item[0] is not None and item[0] <= time.monotonic():
+                del self.values[key]
+                return None
+            return item[1]
+
+    def set(self, key, text, ttl=None):
+        with self.lock:
+            self.values[key] = (time.monotonic() + ttl if ttl else None, text)
+
+    def delete(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+
+    def incr(self, key):
+        with self.lock:
+            _, text = self.values.get(key, (None, "0"))
+            value = int(text) + 1
+            self.values[key] = (None, str(value))
+            return value
+
+
+class RedisBackend:
+    """Shared cache on a Redis server, for running several API processes."""
+
+    def __init__(self, url):
+        # Optional dependency, only needed when CACHE_URL points at Redis
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, text, ttl=None):
+        self.client.set(key, text, ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+
+class ReadThroughCache:
+    """Read-through cache for MotoData reads, in front of the database.
+
+    Lookups try the in-process LRU first, then the shared backend if there
+    is one, and only then load from the database, filling both layers.
+    Single entries are cached under entry:<id> and invalidated by id when
+    a row changes. List pages depend on every row, so their keys include a
+    generation number that any write bumps: old pages are then never looked
+    up again and age out of the LRU. With a shared backend the generation
+    lives there, so a write in one process retires the pages of all of
+    them; a row cached in another process's LRU may still be served until
+    its ttl runs out. Keys in the backend carry a generation of their own,
+    which invalidate_all() bumps to retire every cached row at once, when
+    the rows a write changed are not known by id.
+
+    A load racing an invalidation of the same key is not cached: each key
+    being loaded has a version that invalidating it bumps, and the loaded
+    value is stored only if the version is unchanged, so a row read before
+    a write cannot be cached after the write invalidated it.
+    """
+
+    def __init__(self, local=None, backend=None, ttl=CACHE_TTL):
+        self.local = local if local is not None else LRUCache(ttl=ttl)
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.loading = {}  # key -> [loads in flight, version]
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key, load):
+        """The cached value for key, or load() stored under it. None results are not cached."""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("hits")
+            return value
+
+        if self.backend is not None:
+            shared_key = self.shared_key(key)
+            text = self.backend.get(shared_key)
+            if text is not None:
+                value = json.loads(text)
+                self.local.set(key, value)
+                self._count("shared_hits")
+                return value
+
+        with self.lock:
+            self.misses += 1
+            loading = self.loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            version = loading[1]
+        try:
+            value = load()
+            if value is not None:
+                # Stored under the lock, so an invalidation either bumps the version
+                # first or deletes what was stored afterwards
+                with self.lock:
+                    fresh = loading[1] == version
+                    if fresh:
+                        self.local.set(key, value)
+                if fresh and self.backend is not None:
+                    # The shared backend is written outside the lock. An invalidation that
+                    # deleted the key before this set landed has bumped the version since
+                    self.backend.set(shared_key, json.dumps(value), self.ttl)
+                    with self.lock:
+                        fresh = loading[1] == version
+                    if not fresh:
+                        self.backend.delete(shared_key)
+        finally:
+            with self.lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    del self.loading[key]
+        return value
+
+    def shared_key(self, key):
+        """The key under which the shared backend holds key, in its current generation."""
+        return f"{self.backend.get(SHARED_GENERATION_KEY) or 0}:{key}"
+
+    def entry_key(self, entry_id):
+        return f"entry:{entry_id}"
+
+    def list_key(self, args):
+        """Key for a list page: the current generation plus the sorted query parameters."""
+        if self.backend is not None:
+            generation = self.backend.get(GENERATION_KEY) or 0
+        else:
+            generation = self.generation
+        query = "&".join(f"{name}={value}" for name, value in sorted(args.items(multi=True)))
+        return f"list:{generation}:{query}"
+
+    def invalidate_entry(self, entry_id):
+        """Forget one row and every list page, after it was updated or deleted."""
+        self.invalidate_entries([entry_id])
+
+    def invalidate_entries(self, entry_ids):
+        """Forget the given rows and every list page, after a batch update or delete."""
+        keys = [self.entry_key(entry_id) for entry_id in entry_ids]
+        with self.lock:
+            for key in keys:
+                loading = self.loading.get(key)
+                if loading is not None:
+                    loading[1] += 1
+        for key in keys:
+            self.local.delete(key)
+        if self.backend is not None:
+            generation = self.backend.get(SHARED_GENERATION_KEY) or 0
+            for key in keys:
+                self.backend.delete(f"{generation}:{key}")
+        self.invalidate_lists()
+
+    def invalidate_all(self):
+        """Forget every row and list page, after a write to rows that are not known by id."""
+        with self.lock:
+            for loading in self.loading.values():
+                loading[1] += 1
+        self.local.clear()
+        if self.backend is not None:
+            self.backend.incr(SHARED_GENERATION_KEY)
+        self.invalidate_lists()
+
+    def invalidate_lists(self):
+        """Retire every cached list page, after rows were added or changed."""
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+        if self.backend is not None:
+            self.backend.incr(GENERATION_KEY)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "invalidations": self.invalidations,
+            "entries": len(self.local),
+            "max_entries": self.local.max_entries,
+            "ttl": self.ttl,
+            "shared_backend": type(self.backend).__name__ if self.backend is not None else None,
+        }
+
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
@@ -1,12 +1,104 @@
 import socket
 
-def connect_to_server(command):
-    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client.connect(('localhost', 12345))
-    client.send(command.encode('utf-8'))
-    response = client.recv(1024).decode('utf-8')
+from tcp_server import FRAME_HEADER, FRAMED_RECV_SIZE, encode_frame
+
+HOST = 'localhost'
+PORT = 12345
+# Commands a batch sends ahead before reading their responses, so neither side's buffers fill up
+PIPELINE_WINDOW = 128
+PIPELINE_WINDOW_BYTES = 64 * 1024
+
+
+class Client:
+    """A connection to tcp_server that stays open across commands and speaks the framed protocol.
+
+    send() runs one command. send_batch() pipelines many: their frames go
+    out together, a window at a time, and the responses come back in the
+    same order. Either way the connect handshake and TCP slow start are
+    paid once per client, not once per command.
+    """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.address = (host, port)
+        self.socket = None
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def connect(self):
+        if self.socket is None:
+            self.socket = socket.create_connection(self.address)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.buffer.clear()
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def send(self, command):
+        return self.send_batch([command])[0]
+
+    def send_batch(self, commands):
+        """Send every command over the open connection and return their responses in order."""
+        self.connect()
+        responses = []
+        try:
+            window = []
+            window_bytes = 0
+            for command in commands:
+                frame = encode_frame(command)
+                window.append(frame)
+                window_bytes += len(frame)
+                if len(window) >= PIPELINE_WINDOW or window_bytes >= PIPELINE_WINDOW_BYTES:
+                    responses.extend(self._exchange(window))
+                    window = []
+                    window_bytes = 0
+            if window:
+                responses.extend(self._exchange(window))
+        except OSError:
+            # The connection is in an unknown state; the next call reconnects
+            self.close()
+            raise
+        return responses
+
+    def _exchange(self, frames):
+        self.socket.sendall(b''.join(frames))
+        return [self._read_frame() for _ in frames]
+
+    def _read_frame(self):
+        header = self._read_exactly(FRAME_HEADER.size)
+        size, = FRAME_HEADER.unpack(header)
+        return self._read_exactly(size).decode('utf-8')
+
+    def _read_exactly(self, size):
+        while len(self.buffer) < size:
+            data = self.socket.recv(FRAMED_RECV_SIZE)
+            if not data:
+                raise ConnectionError('Server closed the connection')
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def connect_to_server(command, client=None):
+    """Send one command and print the response, over client's connection if one is given."""
+    if client is None:
+        with Client() as client:
+            response = client.send(command)
+    else:
+        response = client.send(command)
     print("Server response:", response)
-    client.close()
 
-connect_to_server('write Hello, this is a test message!')
-connect_to_server('read')
+
+if __name__ == '__main__':
+    with Client() as client:
+        connect_to_server('write Hello, this is a test message!', client)
+        connect_to_server('read', client)
+        for response in client.send_batch([f'write Batched message {i}' for i in range(3)]):
+            print("Server response:", response)
@@ -1,39 +1,206 @@
+import argparse
+import os
+import selectors
+import signal
 import socket
+import struct
 import threading
+import time
+from collections import deque, namedtuple
 from threading import Lock
 
+from log_store import DURABILITY_POLICIES, FSYNC_INTERVAL, GroupCommitWriter, LogStore
+
+# Written lines live in an append-only segment store; a shared file from before it is imported once
 FILE_PATH = 'shared_file.txt'
-file_lock = Lock()
+STORE_DIR = 'shared_log'
+# Records a single read or tail command may return
+MAX_READ_COUNT = 10000
+# When a write is acknowledged; see GroupCommitWriter
+DURABILITY = 'batch'
+store = None
+committer = None
+store_lock = Lock()
 
-def handle_client(client_socket):
-    while True:
-        message = client_socket.recv(1024).decode('utf-8')
-        if not message:
-            break
+HOST = '0.0.0.0'
+PORT = 12345
+# Pending connections the kernel queues while the server is busy
+BACKLOG = 128
+# Open client connections the selector engine serves at once; more wait in the backlog
+MAX_CONNECTIONS = 10000
+RECV_SIZE = 1024
+# Seconds a graceful shutdown waits for pending responses to be sent
+SHUTDOWN_TIMEOUT = 5.0
 
-        # Interpret message as a command
-        command, *data = message.split()
+# Framed connections send every command and response as a 4-byte big-endian length, then UTF-8 text.
+# Frames stay under 16 MiB, so a framed connection always starts with a zero byte, which a text
+# command never does: that first byte tells the server which protocol the client speaks.
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 2 ** 24 - 1
+# Framed connections carry many commands per recv, so they read in bigger chunks
+FRAMED_RECV_SIZE = 64 * 1024
+
+def encode_frame(text):
+    payload = text.encode('utf-8')
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ValueError(f'Frame of {len(payload)} bytes is larger than {MAX_FRAME_SIZE}')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def encode_response(text):
+    """Frame a response, or an error in its place when it does not fit in one frame."""
+    try:
+        return encode_frame(text)
+    except ValueError:
+        return encode_frame('Response too large for one frame; use read <offset> <count> with a smaller count\n')
+
+class FrameDecoder:
+    """Split a byte stream into frames, however the bytes were split or coalesced by recv."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Add received bytes and return the payloads of the frames now complete, in order."""
+        self.buffer += data
+        frames = []
+        start = 0
+        while len(self.buffer) - start >= FRAME_HEADER.size:
+            size, = FRAME_HEADER.unpack_from(self.buffer, start)
+            if size > MAX_FRAME_SIZE:
+                raise ValueError(f'Frame of {size} bytes is larger than {MAX_FRAME_SIZE}')
+            end = start + FRAME_HEADER.size + size
+            if end > len(self.buffer):
+                break
+            frames.append(self.buffer[start + FRAME_HEADER.size:end].decode('utf-8', errors='replace'))
+            start = end
+        del self.buffer[:start]
+        return frames
+
+def open_store(directory=STORE_DIR, durability=DURABILITY, interval=FSYNC_INTERVAL):
+    """Open the log store and its group-commit writer, importing an existing shared_file.txt into a new store."""
+    global store, committer
+    with store_lock:
+        if store is None:
+            store = LogStore(directory)
+            if not len(store) and os.path.exists(FILE_PATH):
+                with open(FILE_PATH, 'r') as file:
+                    store.append([line.rstrip('\n') for line in file])
+                store.sync()
+            committer = GroupCommitWriter(store, durability, interval)
+        return store
+
+def parse_counts(data, names):
+    """The command's arguments as non-negative integers, one per name."""
+    if len(data) != len(names) or not all(value.isdigit() for value in data):
+        raise ValueError(f"expected {' '.join(f'<{name}>' for name in names)}")
+    values = [int(value) for value in data]
+    if values[-1] > MAX_READ_COUNT:
+        raise ValueError(f'at most {MAX_READ_COUNT} records per command')
+    return values
+
+def format_records(offset, records, total):
+    content = ''.join(f'{record}\n' for record in records)
+    return f'{len(records)} records from offset {offset} of {total}:\n{content}\n'
+
+# A write handed to the group-commit writer; its response may be sent once the future resolves
+PendingWrite = namedtuple('PendingWrite', 'future response')
+
+def is_write(message):
+    return (message.split(None, 1) or [''])[0].lower() == 'write'
+
+def start_command(message):
+    """Begin one client command: return its response text, or a PendingWrite for a write.
+
+    write <text> appends a line; read returns the first MAX_READ_COUNT lines,
+    read <offset> <count> a range of them and tail <count> the last ones, by
+    line offset from 0.
+    """
+    log = store if store is not None else open_store()
+    command, *data = message.split() or ['']
+    try:
         if command.lower() == 'write':
             data_to_write = ' '.join(data)
-            with file_lock:  # Ensure safe write access to file
-                with open(FILE_PATH, 'a') as file:
-                    file.write(f'{data_to_write}\n')
-                client_socket.send(f'Written to file: {data_to_write}\n'.encode('utf-8'))
+            return PendingWrite(committer.submit(data_to_write), f'Written to file: {data_to_write}\n')
+        elif command.lower() == 'read' and not data:
+            total = len(log)
+            records = log.read(0, min(total, MAX_READ_COUNT))
+            content = ''.join(f'{record}\n' for record in records)
+            if total > len(records):
+                content += f'... {total - len(records)} more of {total} records; use read <offset> <count>\n'
+            return f'File content:\n{content}\n'
         elif command.lower() == 'read':
-            with file_lock:  # Ensure safe read access to file
-                with open(FILE_PATH, 'r') as file:
-                    content = file.read()
-                client_socket.send(f'File content:\n{content}\n'.encode('utf-8'))
+            offset, count = parse_counts(data, ('offset', 'count'))
+            return format_records(offset, log.read(offset, count), len(log))
+        elif command.lower() == 'tail':
+            count, = parse_counts(data, ('count',))
+            offset, records = log.tail(count)
+            return format_records(offset, records, len(log))
         else:
-            client_socket.send(f'Unknown command: {command}\n'.encode('utf-8'))
+            return f'Unknown command: {command}\n'
+    except ValueError as e:
+        return f'Invalid {command.lower()}: {e}\n'
+    except Exception as e:
+        # A failed command, e.g. an I/O error in the store, only fails that command
+        return f'Failed {command.lower()}: {e}\n'
+
+def response_text(result):
+    """The response for a start_command result, waiting until a pending write is durable."""
+    if isinstance(result, PendingWrite):
+        try:
+            result.future.result()
+        except Exception as e:
+            return f'Write failed: {e}\n'
+        return result.response
+    return result
+
+def execute(message):
+    """Run one client command and return the response text."""
+    return response_text(start_command(message))
+
+def execute_frames(decoder, data):
+    """Run every command completed by data and return their framed responses, in order.
+
+    Consecutive writes are submitted together so they can share a batch;
+    any other command first waits for the writes before it, so it sees them.
+    """
+    results = []
+    for message in decoder.feed(data):
+        if not is_write(message):
+            for result in results:
+                response_text(result)
+        results.append(start_command(message))
+    return b''.join(encode_response(response_text(result)) for result in results)
+
+def handle_client(client_socket):
+    data = client_socket.recv(RECV_SIZE)
+    if data.startswith(b'\0'):
+        handle_framed_client(client_socket, data)
+        return
 
+    while data:
+        # Interpret message as a command
+        client_socket.send(execute(data.decode('utf-8')).encode('utf-8'))
+        data = client_socket.recv(RECV_SIZE)
+
+    client_socket.close()
+
+def handle_framed_client(client_socket, data):
+    """Serve pipelined framed commands; every response goes out in the order its command came in."""
+    decoder = FrameDecoder()
+    try:
+        while data:
+            client_socket.sendall(execute_frames(decoder, data))
+            data = client_socket.recv(FRAMED_RECV_SIZE)
+    except (ValueError, OSError):
+        pass
     client_socket.close()
 
-def start_server():
+def start_server(host=HOST, port=PORT, backlog=5):
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind(('0.0.0.0', 12345))
-    server.listen(5)
-    print('Server listening on port 12345...')
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(backlog)
+    print(f'Server listening on port {port}...')
 
     while True:
         client_socket, addr = server.accept()
@@ -42,6 +209,267 @@ def start_server():
         client_thread = threading.Thread(target=handle_client, args=(client_socket,))
         client_thread.start()
 
+
+class Connection:
+    """A client of SelectorServer: its socket, the commands it sent and the responses it is owed."""
+
+    def __init__(self, client_socket):
+        self.socket = client_socket
+        self.framed = None  # decided by the first bytes received
+        self.decoder = FrameDecoder()
+        self.commands = deque()  # received, not started yet
+        self.results = deque()  # start_command results not sent yet, in command order
+        self.outgoing = b''
+        self.events = 0
+
+    @property
+    def busy(self):
+        return bool(self.commands or self.results or self.outgoing)
+
+    def encode(self, text):
+        return encode_response(text) if self.framed else text.encode('utf-8')
+
+
+class SelectorServer:
+    """Serve the write/read commands from one thread, multiplexing every connection with selectors.
+
+    An idle connection costs a socket and a small buffer instead of an OS
+    thread. Framed connections may pipeline any number of commands; on
+    the others each recv is one command, as in handle_client. Writes go to
+    the group-commit writer without blocking the loop. When their batch is
+    durable the writer thread wakes the loop, which sends the responses in
+    command order. A command that is not a write waits for the writes
+    before it on the same connection. A connection is not read from while
+    it still has commands running or responses to send, so a slow client
+    cannot pile them up. Once max_connections are open, the server stops
+    accepting and new clients wait in the listen backlog until a
+    connection closes.
+    """
+
+    def __init__(self, host=HOST, port=PORT, backlog=BACKLOG, max_connections=MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.selector = selectors.DefaultSelector()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(backlog)
+        self.server.setblocking(False)
+        self.accepting = False
+
+        # shutdown() and finished writes write to this pair to wake the loop from other threads
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ)
+
+        self.connections = {}  # client socket -> Connection
+        self.completed = deque()  # connections with a write that finished, appended by the writer thread
+        self.running = False
+
+    @property
+    def address(self):
+        return self.server.getsockname()
+
+    def serve_forever(self):
+        self.running = True
+        self.resume_accepting()
+        print(f'Server listening on port {self.address[1]}...')
+        try:
+            while self.running:
+                for key, events in self.selector.select():
+                    if key.fileobj is self.server:
+                        self.accept()
+                    elif key.fileobj is self.wakeup_reader:
+                        self.wake()
+                    elif events & selectors.EVENT_WRITE:
+                        self.flush(key.data)
+                    else:
+                        self.receive(key.data)
+        finally:
+            self.close()
+
+    def wakeup(self):
+        try:
+            self.wakeup_writer.send(b'\0')
+        except OSError:
+            # The buffer is full, so a wakeup is already pending, or the server is closed
+            pass
+
+    def shutdown(self):
+        """Ask serve_forever to stop; safe to call from other threads and signal handlers."""
+        self.running = False
+        self.wakeup()
+
+    def write_done(self, connection):
+        """Called by the writer thread when one of the connection's writes is durable."""
+        self.completed.append(connection)
+        self.wakeup()
+
+    def wake(self):
+        try:
+            while self.wakeup_reader.recv(RECV_SIZE):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self.completed:
+            connection = self.completed.popleft()
+            if self.connections.get(connection.socket) is connection:
+                self.advance(connection)
+
+    def resume_accepting(self):
+        if not self.accepting:
+            self.selector.register(self.server, selectors.EVENT_READ)
+            self.accepting = True
+
+    def pause_accepting(self):
+        if self.accepting:
+            self.selector.unregister(self.server)
+            self.accepting = False
+
+    def accept(self):
+        while len(self.connections) < self.max_connections:
+            try:
+                client_socket, addr = self.server.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            client_socket.setblocking(False)
+            connection = self.connections[client_socket] = Connection(client_socket)
+            self.watch(connection)
+        self.pause_accepting()
+
+    def watch(self, connection):
+        """Wait for the socket to take output if there is some, else for commands if none are running."""
+        if connection.outgoing:
+            events = selectors.EVENT_WRITE
+        else:
+            events = 0 if connection.busy else selectors.EVENT_READ
+        if events != connection.events:
+            if not connection.events:
+                self.selector.register(connection.socket, events, connection)
+            elif not events:
+                self.selector.unregister(connection.socket)
+            else:
+                self.selector.modify(connection.socket, events, connection)
+            connection.events = events
+
+    def receive(self, connection):
+        try:
+            data = connection.socket.recv(FRAMED_RECV_SIZE if connection.framed else RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.disconnect(connection)
+            return
+
+        if connection.framed is None:
+            connection.framed = data.startswith(b'\0')
+        if connection.framed:
+            try:
+                connection.commands.extend(connection.decoder.feed(data))
+            except ValueError:
+                self.disconnect(connection)
+                return
+        else:
+            connection.commands.append(data.decode('utf-8', errors='replace'))
+        self.advance(connection)
+
+    def advance(self, connection):
+        """Start the commands that may start, and queue the responses that are ready, in command order."""
+        commands, results = connection.commands, connection.results
+        ready = []
+        while True:
+            while results and not (isinstance(results[0], PendingWrite) and not results[0].future.done()):
+                ready.append(connection.encode(response_text(results.popleft())))
+            if not commands or (results and not is_write(commands[0])):
+                break
+            result = start_command(commands.popleft())
+            results.append(result)
+            if isinstance(result, PendingWrite):
+                result.future.add_done_callback(lambda future: self.write_done(connection))
+        if ready:
+            connection.outgoing += b''.join(ready)
+            self.flush(connection)
+        else:
+            self.watch(connection)
+
+    def flush(self, connection):
+        """Send as much pending output as the socket takes."""
+        try:
+            sent = connection.socket.send(connection.outgoing)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self.disconnect(connection)
+            return
+        connection.outgoing = connection.outgoing[sent:]
+        self.watch(connection)
+
+    def disconnect(self, connection):
+        if connection.events:
+            self.selector.unregister(connection.socket)
+        del self.connections[connection.socket]
+        connection.socket.close()
+        if self.running:
+            self.resume_accepting()
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        """Stop accepting, finish the commands already received and send their responses, then close."""
+        # Also reached when the loop raised, so no disconnect may start accepting again
+        self.running = False
+        self.pause_accepting()
+        self.server.close()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for connection in list(self.connections.values()):
+                if not connection.busy:
+                    self.disconnect(connection)
+            if not self.connections:
+                break
+            for key, events in self.selector.select(max(0, deadline - time.monotonic())):
+                if key.fileobj is self.wakeup_reader:
+                    self.wake()
+                elif events & selectors.EVENT_WRITE:
+                    self.flush(key.data)
+        for connection in list(self.connections.values()):
+            self.disconnect(connection)
+        self.selector.close()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve write/read commands on a shared file.')
+    parser.add_argument('--engine', choices=['threaded', 'selector'], default='threaded',
+                        help='a thread per connection, or one thread multiplexing them all')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backlog', type=int, default=None,
+                        help=f'listen backlog (default 5 threaded, {BACKLOG} selector)')
+    parser.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS,
+                        help='open connections the selector engine serves at once')
+    parser.add_argument('--data-dir', default=STORE_DIR, help='directory of the log segments')
+    parser.add_argument('--durability', choices=DURABILITY_POLICIES, default=DURABILITY,
+                        help='acknowledge writes once written to the OS, after a per-batch fsync, '
+                             'or after a periodic fsync')
+    parser.add_argument('--fsync-interval-ms', type=float, default=FSYNC_INTERVAL * 1000,
+                        help='milliseconds between fsyncs with --durability interval')
+    args = parser.parse_args()
+    open_store(args.data_dir, args.durability, args.fsync_interval_ms / 1000)
+
+    if args.engine == 'threaded':
+        start_server(args.host, args.port, args.backlog or 5)
+        return
+
+    server = SelectorServer(args.host, args.port, args.backlog or BACKLOG, args.max_connections)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+    signal.signal(signal.SIGINT, lambda signum, frame: server.shutdown())
+    server.serve_forever()
+    committer.close()
+
 # Start the server
 if __name__ == '__main__':
-    start_server()
+    # Usage: python tcp_server.py [--engine selector] [--port 12345] [--backlog 128] [--max-connections 10000]
+    #                             [--durability none|batch|interval] [--fsync-interval-ms 10]
+    main()
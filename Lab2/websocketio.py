@@ -1,11 +1,13 @@
 import json
 from flask import Flask, request
-from flask_socketio import SocketIO, join_room, leave_room, send
+from flask_socketio import SocketIO, emit, join_room, leave_room, send
+
+from presence import Presence
 
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins=["https://piehost.com"])
 
-rooms = {}
+presence = Presence()
 
 
 def parse_data(data):
@@ -29,19 +31,17 @@ def handle_join(data):
     room = data.get('room')
 
     # Prevent the same user from joining the room multiple times
-    if room not in rooms:
-        rooms[room] = []
-    if username in rooms[room]:
+    if not presence.join(request.sid, room, username):
         send(f"{username} is already in the room {room}.", to=room)
         return
 
     join_room(room)
-    rooms[room].append(username)
+    # Catch the new member up on the room's recent messages
+    emit('history', presence.history(room), to=request.sid)
 
     send(f"{username} has joined the room {room}.", to=room)
 
 
-
 @socketio.on('leave')
 def handle_leave(data):
     data = parse_data(data)
@@ -51,14 +51,19 @@ def handle_leave(data):
     username = data.get('username')
     room = data.get('room')
 
-    # Only proceed if the user is in the room
-    if room in rooms and username in rooms[room]:
+    # Only proceed if this client joined the room as this user
+    if presence.leave(request.sid, room, username):
         send(f"{username} has left the room {room}.", to=room)
-        rooms[room].remove(username)
         leave_room(room)
     else:
         send(f"{username} is not in the room {room}.", to=request.sid)
 
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    # Socket.IO drops the client from its rooms; drop it from the presence index too
+    for room, username in presence.disconnect(request.sid):
+        send(f"{username} has left the room {room}.", to=room)
+
 @socketio.on('message')
 def handle_message(data):
     data = parse_data(data)
@@ -69,7 +74,9 @@ def handle_message(data):
     msg = data.get('message')
     username = data.get('username')
 
-    send(f"{username}: {msg}", to=room)
+    text = f"{username}: {msg}"
+    presence.record(room, text)
+    send(text, to=room)
 
 
 # Run the server